@@ -23,12 +23,37 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import LinearRegression
 from scipy.interpolate import interp1d
+from scipy.signal import lfilter, lfiltic
 import warnings
 warnings.filterwarnings('ignore')
 
+
+def _in_place_moving_average(values, weights):
+    """
+    One in-place weighted moving-average pass over the interior of ``values``.
+    
+    Equivalent to ``for i in range(k, n - k): y[i] = sum(w * y[i + j - k] ...)`` updating
+    ``y`` as it goes, so the left half of the window sees already-smoothed values. That
+    recursion is an IIR filter, which lfilter evaluates in C; the k edge bins at each
+    end are left untouched, as in the loop.
+    """
+    weights = np.asarray(weights, dtype=float)
+    k = len(weights) // 2
+    n = len(values)
+    if n <= 2 * k:
+        return values.copy()
+    
+    # y[i] - sum_m w[k-m] * y[i-m] = sum_d w[2k-d] * x[i+k-d], with the input advanced by k
+    b = weights[::-1][:k + 1]
+    a = np.concatenate(([1.0], -weights[:k][::-1]))
+    x = np.asarray(values, dtype=float)
+    zi = lfiltic(b, a, y=x[:k][::-1], x=x[k:2 * k][::-1])
+    
+    smoothed = x.copy()
+    smoothed[k:n - k] = lfilter(b, a, x[2 * k:], zi=zi)[0]
+    return smoothed
+
 class CounterfactualBunchingAnalysis:
     """
     Implements Steps 1-5: Complete Bunching Analysis Pipeline
@@ -69,6 +94,12 @@ class CounterfactualBunchingAnalysis:
         self.F_obs = None
         self.F_cf = None
         
+        # Interpolants over the binned densities/CDF (built once, reused by Step 4)
+        self.f_obs_interp = None
+        self.f_cf_interp = None
+        self.F_cf_interp = None
+        self.F_cf_inverse = None
+        
         # Bunching statistics
         self.q_N_obs = None
         self.q_R_obs = None
@@ -91,20 +122,23 @@ class CounterfactualBunchingAnalysis:
     def load_and_prepare_data(self):
         """Load synthetic firm data and prepare binned distributions."""
         
-        # Load data
+        # Load data (only the columns the histogram needs, parsed by pyarrow)
         data_path = Path(__file__).parent / 'synthetic_firms_turnover.csv'
-        df = pd.read_csv(data_path)
+        df = pd.read_csv(data_path, engine='pyarrow', usecols=['annual_turnover_k', 'weight'],
+                         dtype={'annual_turnover_k': 'float32', 'weight': 'float32'})
         
         # Focus on wider range for counterfactual estimation
-        df_filtered = df[(df['annual_turnover_k'] >= 20) & (df['annual_turnover_k'] <= 140)].copy()
+        turnover = df['annual_turnover_k'].to_numpy()
+        in_range = (turnover >= 20) & (turnover <= 140)
+        df_filtered = df[in_range]
         
         # Create bins of £1k intervals
         bin_edges = np.arange(19.5, 140.5, 1.0)
         self.bin_centers = np.arange(20, 140)  # 20k to 139k
         
-        # Calculate observed histogram (density)
-        hist_counts, _ = np.histogram(df_filtered['annual_turnover_k'], 
-                                    bins=bin_edges, weights=df_filtered['weight'])
+        # Calculate observed histogram (density), accumulating the float32 weights in float64
+        hist_counts, _ = np.histogram(turnover[in_range], bins=bin_edges,
+                                      weights=df['weight'].to_numpy()[in_range].astype(np.float64))
         
         # Normalize to get density (f^obs)
         bin_width = 1.0
@@ -129,21 +163,21 @@ class CounterfactualBunchingAnalysis:
         # Use distance from threshold as feature
         y_dist = self.bin_centers - self.T_star
         
-        # Fit polynomial (degree 3 as in bunching_analysis.py)
-        poly_features = PolynomialFeatures(degree=3, include_bias=True)
-        X_poly = poly_features.fit_transform(y_dist[reg_mask].reshape(-1, 1))
-        
-        # Fit regression
-        reg = LinearRegression(fit_intercept=False)
-        reg.fit(X_poly, self.f_obs[reg_mask])
+        # Fit polynomial (degree 3 as in bunching_analysis.py) by least squares
+        coefs = np.polynomial.polynomial.polyfit(y_dist[reg_mask], self.f_obs[reg_mask], deg=3)
         
         # Predict counterfactual for all points
-        X_all = poly_features.transform(y_dist.reshape(-1, 1))
-        self.f_cf = reg.predict(X_all)
+        self.f_cf = np.polynomial.polynomial.polyval(y_dist, coefs)
         
         # Ensure positive predictions (same as bunching_analysis.py)
         self.f_cf = np.maximum(self.f_cf, 0)
         
+        # Interpolation functions for densities
+        self.f_obs_interp = interp1d(self.bin_centers, self.f_obs, kind='linear', 
+                                     bounds_error=False, fill_value=0)
+        self.f_cf_interp = interp1d(self.bin_centers, self.f_cf, kind='linear', 
+                                    bounds_error=False, fill_value=0)
+        
     def compute_cdfs(self):
         """Compute CDFs F^obs and F^cf."""
         
@@ -158,10 +192,19 @@ class CounterfactualBunchingAnalysis:
         cumsum_cf = np.cumsum(self.f_cf * bin_width)
         self.F_cf = cumsum_cf / cumsum_cf[-1]
         
+        # Counterfactual CDF and its (approximate) inverse
+        self.F_cf_interp = interp1d(self.bin_centers, self.F_cf, kind='linear',
+                                    bounds_error=False, fill_value='extrapolate')
+        self.F_cf_inverse = interp1d(self.F_cf, self.bin_centers, kind='linear',
+                                     bounds_error=False, fill_value='extrapolate')
+        
     def compute_masses_in_window(self):
         """
         Compute masses in the window as per the formulas:
         q_N^obs, q_R^obs, q_N^cf, q_R^cf
+        together with excess mass E and missing mass Delta_R:
+        E = ∫[f^obs - f^cf]_+ dT  (in left window)
+        Delta_R = ∫[f^cf - f^obs]_+ dT  (in right window)
         """
         
         # Find indices for integration bounds
@@ -170,34 +213,23 @@ class CounterfactualBunchingAnalysis:
         
         bin_width = 1.0
         
+        # Slice each density once per window; every statistic below reuses the slices
+        f_obs_N, f_cf_N = self.f_obs[mask_N], self.f_cf[mask_N]
+        f_obs_R, f_cf_R = self.f_obs[mask_R], self.f_cf[mask_R]
+        
         # Observed masses
-        self.q_N_obs = np.sum(self.f_obs[mask_N] * bin_width)
-        self.q_R_obs = np.sum(self.f_obs[mask_R] * bin_width)
+        self.q_N_obs = np.sum(f_obs_N * bin_width)
+        self.q_R_obs = np.sum(f_obs_R * bin_width)
         
         # Counterfactual masses  
-        self.q_N_cf = np.sum(self.f_cf[mask_N] * bin_width)
-        self.q_R_cf = np.sum(self.f_cf[mask_R] * bin_width)
-        
-    def compute_excess_missing_mass(self):
-        """
-        Compute excess mass E and missing mass Delta_R:
-        E = ∫[f^obs - f^cf]_+ dT  (in left window)
-        Delta_R = ∫[f^cf - f^obs]_+ dT  (in right window)
-        """
-        
-        # Masks for left and right windows
-        mask_N = (self.bin_centers >= self.T_lower) & (self.bin_centers < self.T_star)
-        mask_R = (self.bin_centers >= self.T_star) & (self.bin_centers <= self.T_upper)
-        
-        bin_width = 1.0
+        self.q_N_cf = np.sum(f_cf_N * bin_width)
+        self.q_R_cf = np.sum(f_cf_R * bin_width)
         
         # Excess mass in left window: [f^obs - f^cf]_+
-        excess_left = np.maximum(self.f_obs[mask_N] - self.f_cf[mask_N], 0)
-        self.E = np.sum(excess_left * bin_width)
+        self.E = np.sum(np.maximum(f_obs_N - f_cf_N, 0) * bin_width)
         
         # Missing mass in right window: [f^cf - f^obs]_+
-        missing_right = np.maximum(self.f_cf[mask_R] - self.f_obs[mask_R], 0)
-        self.Delta_R = np.sum(missing_right * bin_width)
+        self.Delta_R = np.sum(np.maximum(f_cf_R - f_obs_R, 0) * bin_width)
         
     def compute_bunching_ratio(self):
         """
@@ -306,18 +338,14 @@ class CounterfactualBunchingAnalysis:
         if not hasattr(self, 'Pi'):
             self.compute_aggregate_displaced_share()
             
-        # Create interpolation functions for densities
-        f_obs_interp = interp1d(self.bin_centers, self.f_obs, kind='linear', 
-                               bounds_error=False, fill_value=0)
-        f_cf_interp = interp1d(self.bin_centers, self.f_cf, kind='linear', 
-                              bounds_error=False, fill_value=0)
-        
         # Compute excess density at T_obs
-        excess_density = np.maximum(f_obs_interp(T_obs) - f_cf_interp(T_obs), 0)
+        f_obs_T = self.f_obs_interp(T_obs)
+        excess_density = np.maximum(f_obs_T - self.f_cf_interp(T_obs), 0)
         
         # Local bunching probability: what fraction of firms at T_obs are bunchers?
         # All excess density should be bunchers, so π = excess / observed
-        pi_T_obs = excess_density / f_obs_interp(T_obs) if f_obs_interp(T_obs) > 0 else 0
+        pi_T_obs = np.divide(excess_density, f_obs_T,
+                             out=np.zeros_like(excess_density), where=f_obs_T > 0)
         
         return pi_T_obs
         
@@ -327,34 +355,29 @@ class CounterfactualBunchingAnalysis:
         u(T^obs) = ∫[T*-W to T^obs] [f^obs - f^cf]_+ dT / E
         
         Args:
-            T_obs: Observed turnover (must be in [T*-W, T*])
+            T_obs: Observed turnover (scalar or array, clipped to [T*-W, T*])
             
         Returns:
-            Rank among bunchers ∈ [0,1]
+            Rank among bunchers ∈ [0,1] (scalar or array)
         """
         # Only valid for T_obs in [T*-W, T*]
         T_obs = np.clip(T_obs, self.T_lower, self.T_star)
         
         # Find integration bounds in our bin indices
         start_idx = np.searchsorted(self.bin_centers, self.T_lower, side='left')
-        end_idx = np.searchsorted(self.bin_centers, T_obs, side='right')
-        
-        # Compute cumulative excess mass up to T_obs
-        if end_idx <= start_idx:
-            return 0.0
-            
-        # Get the relevant range
-        bin_subset = self.bin_centers[start_idx:end_idx]
-        f_obs_subset = self.f_obs[start_idx:end_idx]
-        f_cf_subset = self.f_cf[start_idx:end_idx]
+        end_idx = np.maximum(np.searchsorted(self.bin_centers, T_obs, side='right'), start_idx)
         
-        # Compute excess mass in this range
+        # Cumulative excess mass [f^obs - f^cf]_+ over bins, so each T_obs is a lookup
         bin_width = 1.0
-        excess_subset = np.maximum(f_obs_subset - f_cf_subset, 0)
-        cumulative_excess = np.sum(excess_subset * bin_width)
+        excess = np.maximum(self.f_obs - self.f_cf, 0) * bin_width
+        cumulative = np.concatenate(([0.0], np.cumsum(excess)))
+        cumulative_excess = cumulative[end_idx] - cumulative[start_idx]
         
         # Rank among bunchers
-        u_T_obs = cumulative_excess / self.E if self.E > 0 else 0
+        if self.E > 0:
+            u_T_obs = cumulative_excess / self.E
+        else:
+            u_T_obs = np.zeros_like(cumulative_excess)
         
         return np.clip(u_T_obs, 0, 1)
         
@@ -370,44 +393,29 @@ class CounterfactualBunchingAnalysis:
         Returns:
             Expected counterfactual turnover T^cf
         """
-        T_obs = np.atleast_1d(T_obs)
-        T_cf = np.zeros_like(T_obs, dtype=float)
-        
-        # Create CDF interpolation function
-        # Normalize CDF to be between 0 and 1
-        F_cf_normalized = self.F_cf
-        F_cf_interp = interp1d(self.bin_centers, F_cf_normalized, kind='linear',
-                              bounds_error=False, fill_value='extrapolate')
-        
-        # Inverse CDF function (approximate)
-        cdf_values = F_cf_normalized
-        inverse_cdf = interp1d(cdf_values, self.bin_centers, kind='linear',
-                              bounds_error=False, fill_value='extrapolate')
+        T_obs = np.atleast_1d(T_obs).astype(float)
+        T_cf = T_obs.copy()
         
         # Get F^cf(T*)
-        F_cf_at_threshold = F_cf_interp(self.T_star)
+        F_cf_at_threshold = self.F_cf_interp(self.T_star)
         
-        for i, T_obs_val in enumerate(T_obs):
-            if self.T_lower <= T_obs_val <= self.T_star:
-                # In bunching region - apply the mapping
-                
-                # Compute local bunching probability
-                pi_val = self.compute_local_bunching_probability(T_obs_val)
-                
-                # Compute rank among bunchers
-                u_val = self.compute_rank_among_bunchers(T_obs_val)
-                
-                # Compute the CDF argument
-                cdf_arg = F_cf_at_threshold + u_val * self.Delta_R / np.sum(self.f_cf)
-                cdf_arg = np.clip(cdf_arg, 0, 1)  # Ensure valid CDF value
-                
-                # Apply the mapping formula
-                T_cf_displaced = inverse_cdf(cdf_arg)
-                T_cf[i] = (1 - pi_val) * T_obs_val + pi_val * T_cf_displaced
-                
-            else:
-                # Outside bunching region - no change
-                T_cf[i] = T_obs_val
+        # Only firms in the bunching region are remapped; everyone else is unchanged
+        in_region = (T_obs >= self.T_lower) & (T_obs <= self.T_star)
+        
+        if np.any(in_region):
+            T_region = T_obs[in_region]
+            
+            # Local bunching probability and rank among bunchers for all firms at once
+            pi_val = self.compute_local_bunching_probability(T_region)
+            u_val = self.compute_rank_among_bunchers(T_region)
+            
+            # Compute the CDF argument
+            cdf_arg = F_cf_at_threshold + u_val * self.Delta_R / np.sum(self.f_cf)
+            cdf_arg = np.clip(cdf_arg, 0, 1)  # Ensure valid CDF value
+            
+            # Apply the mapping formula
+            T_cf_displaced = self.F_cf_inverse(cdf_arg)
+            T_cf[in_region] = (1 - pi_val) * T_region + pi_val * T_cf_displaced
                 
         return T_cf if len(T_cf) > 1 else T_cf[0]
         
@@ -436,23 +444,18 @@ class CounterfactualBunchingAnalysis:
         print(f"Analyzing {len(sample_turnovers)} sample turnover points:")
         print(f"Sample range: £{sample_turnovers[0]:.1f}k to £{sample_turnovers[-1]:.1f}k")
         
-        # Compute mappings for sample
-        results = []
-        for T_obs in sample_turnovers:
-            pi_val = self.compute_local_bunching_probability(T_obs)
-            u_val = self.compute_rank_among_bunchers(T_obs)
-            T_cf_val = self.compute_counterfactual_mapping(T_obs)
-            
-            results.append({
-                'T_obs': T_obs,
-                'pi': pi_val,
-                'u': u_val,
-                'T_cf': T_cf_val,
-                'displacement': T_cf_val - T_obs
-            })
-            
+        # Compute mappings for the whole sample in one pass
+        sample_turnovers = np.asarray(sample_turnovers, dtype=float)
+        T_cf_vals = np.atleast_1d(self.compute_counterfactual_mapping(sample_turnovers))
+        
         # Create results DataFrame
-        results_df = pd.DataFrame(results)
+        results_df = pd.DataFrame({
+            'T_obs': sample_turnovers,
+            'pi': self.compute_local_bunching_probability(sample_turnovers),
+            'u': self.compute_rank_among_bunchers(sample_turnovers),
+            'T_cf': T_cf_vals,
+            'displacement': T_cf_vals - sample_turnovers
+        })
         
         # Print summary
         print(f"\nStep 4 Results Summary:")
@@ -487,7 +490,6 @@ class CounterfactualBunchingAnalysis:
         
         # Compute all masses and statistics
         self.compute_masses_in_window()
-        self.compute_excess_missing_mass()
         self.compute_bunching_ratio()
         
         # Step 2: Set effective wedge
@@ -528,7 +530,7 @@ class CounterfactualBunchingAnalysis:
         self.plot_results(include_step5=include_step5_plot)
         
         # Apply Step 4 advanced mapping to synthetic firms and save results  
-        self.apply_step4_to_synthetic_firms('synthetic_firms_step4_mapped.csv')
+        self.apply_step4_to_synthetic_firms('synthetic_firms_step4_mapped.parquet')
         
         return self.get_results_dict()
     
@@ -644,33 +646,26 @@ class CounterfactualBunchingAnalysis:
     
     def apply_smoothing(self, distribution):
         """Apply aggressive smoothing to eliminate sharp changes in Step 5 curve."""
-        smooth_dist = distribution.copy()
-        
-        # Multiple passes of progressively wider smoothing
+        # Multiple passes of progressively wider smoothing. Each pass updates the
+        # distribution in place, left to right, so it runs as a recursive filter
         
         # Pass 1: 3-point moving average
-        for i in range(1, len(smooth_dist) - 1):
-            smooth_dist[i] = 0.25 * smooth_dist[i-1] + 0.5 * smooth_dist[i] + 0.25 * smooth_dist[i+1]
+        smooth_dist = _in_place_moving_average(distribution, [0.25, 0.5, 0.25])
         
         # Pass 2: 5-point moving average  
-        for i in range(2, len(smooth_dist) - 2):
-            smooth_dist[i] = 0.1 * smooth_dist[i-2] + 0.2 * smooth_dist[i-1] + 0.4 * smooth_dist[i] + 0.2 * smooth_dist[i+1] + 0.1 * smooth_dist[i+2]
+        smooth_dist = _in_place_moving_average(smooth_dist, [0.1, 0.2, 0.4, 0.2, 0.1])
         
         # # Pass 3: 7-point moving average (more aggressive)
-        # for i in range(3, len(smooth_dist) - 3):
-        #     smooth_dist[i] = (0.05 * smooth_dist[i-3] + 0.1 * smooth_dist[i-2] + 0.15 * smooth_dist[i-1] + 
-        #                     0.4 * smooth_dist[i] + 0.15 * smooth_dist[i+1] + 0.1 * smooth_dist[i+2] + 0.05 * smooth_dist[i+3])
+        # smooth_dist = _in_place_moving_average(smooth_dist, [0.05, 0.1, 0.15, 0.4, 0.15, 0.1, 0.05])
         
         # Pass 4: 9-point moving average (very aggressive)
-        # for i in range(4, len(smooth_dist) - 4):
-        #     weights = [0.03, 0.06, 0.09, 0.12, 0.4, 0.12, 0.09, 0.06, 0.03]
-        #     smooth_dist[i] = sum(w * smooth_dist[i + j - 4] for j, w in enumerate(weights))
+        # smooth_dist = _in_place_moving_average(smooth_dist, [0.03, 0.06, 0.09, 0.12, 0.4, 0.12, 0.09, 0.06, 0.03])
         
         # Pass 5: Final Gaussian-like smoothing
-        for i in range(5, len(smooth_dist) - 5):
-            # 11-point Gaussian-weighted average
-            weights = [0.02, 0.03, 0.05, 0.08, 0.12, 0.4, 0.12, 0.08, 0.05, 0.03, 0.02]
-            smooth_dist[i] = sum(w * smooth_dist[i + j - 5] for j, w in enumerate(weights))
+        # 11-point Gaussian-weighted average
+        smooth_dist = _in_place_moving_average(
+            smooth_dist, [0.02, 0.03, 0.05, 0.08, 0.12, 0.4, 0.12, 0.08, 0.05, 0.03, 0.02]
+        )
         
         return smooth_dist
     
@@ -705,35 +700,23 @@ class CounterfactualBunchingAnalysis:
             print("Error: Need Step 4 firm mappings. Run step4_advanced_mapping first.")
             return
             
-        # Calculate firm-level revenues
-        revenues_old = []
-        revenues_new = []
-        revenue_changes = []
-        
+        # Calculate firm-level revenues (all firms at once)
         print(f"\nCalculating revenues for {len(self.firm_mappings)} firms...")
         
-        for i, (T_old, T_new) in enumerate(self.firm_mappings):
-            # Firm-level VAT parameters (in practice, would vary by sector)
-            theta_i = theta_default
-            s_c_i = s_c_default  
-            v_i = v_default
-            
-            # Revenue under old regime: V_old = τ_old * (θ * T_old - v * s_c * T_old)
-            V_old = tau_old * (theta_i * T_old - v_i * s_c_i * T_old)
-            V_old = max(0, V_old)  # Non-negative revenue
-            
-            # Revenue under new regime: V_new = τ_new * (θ * T_new - v * s_c * T_new)  
-            V_new = tau_new * (theta_i * T_new - v_i * s_c_i * T_new)
-            V_new = max(0, V_new)  # Non-negative revenue
-            
-            revenues_old.append(V_old)
-            revenues_new.append(V_new)
-            revenue_changes.append(V_new - V_old)
+        T_old = self.firm_mappings[:, 0]
+        T_new = self.firm_mappings[:, 1]
         
-        # Store results
-        self.revenues_old = np.array(revenues_old)
-        self.revenues_new = np.array(revenues_new) 
-        self.revenue_changes = np.array(revenue_changes)
+        # Firm-level VAT parameters (in practice, would vary by sector)
+        theta_i = theta_default
+        s_c_i = s_c_default  
+        v_i = v_default
+        
+        # Revenue under old regime: V_old = τ_old * (θ * T_old - v * s_c * T_old), non-negative
+        self.revenues_old = np.maximum(0, tau_old * (theta_i * T_old - v_i * s_c_i * T_old))
+        
+        # Revenue under new regime: V_new = τ_new * (θ * T_new - v * s_c * T_new), non-negative
+        self.revenues_new = np.maximum(0, tau_new * (theta_i * T_new - v_i * s_c_i * T_new))
+        self.revenue_changes = self.revenues_new - self.revenues_old
         
         # Aggregate results
         total_revenue_old = np.sum(self.revenues_old)
@@ -866,107 +849,88 @@ class CounterfactualBunchingAnalysis:
         s_c = 0.45  
         v = 0.70
         
-        total_revenue = 0
-        for T_old, T_new in self.firm_mappings[:10000]:  # Sample for speed
-            V = tau_rate * (theta * T_new - v * s_c * T_new)
-            total_revenue += max(0, V)
-        
-        # Scale up to full population
-        scaling_factor = len(self.firm_mappings) / 10000
-        return total_revenue * scaling_factor
+        # Full population in one vectorised pass (no sample-and-scale approximation)
+        T_new = self.firm_mappings[:, 1]
+        return np.maximum(0, tau_rate * (theta * T_new - v * s_c * T_new)).sum()
     
     def calculate_revenue_for_threshold(self, new_threshold):
         """Helper: Calculate total revenue for given threshold"""
         # Simplified: assume threshold change affects firms near boundary
         threshold_effect = (new_threshold - self.T_star) / self.T_star
         
-        total_revenue = 0
         tau_rate = 0.20
         theta = 0.85
         s_c = 0.45
         v = 0.70
         
-        for T_old, T_new in self.firm_mappings[:10000]:  # Sample for speed
-            # Adjust turnover based on threshold change (simplified)
-            if 80 <= T_old <= 100:  # Firms near threshold
-                T_adjusted = T_new * (1 + 0.1 * threshold_effect)  # Small adjustment
-            else:
-                T_adjusted = T_new
-                
-            V = tau_rate * (theta * T_adjusted - v * s_c * T_adjusted)
-            total_revenue += max(0, V)
+        # Full population in one vectorised pass (no sample-and-scale approximation)
+        T_old = self.firm_mappings[:, 0]
+        T_new = self.firm_mappings[:, 1]
         
-        # Scale up to full population  
-        scaling_factor = len(self.firm_mappings) / 10000
-        return total_revenue * scaling_factor
+        # Adjust turnover based on threshold change (simplified): small adjustment for firms near threshold
+        near_threshold = (T_old >= 80) & (T_old <= 100)
+        T_adjusted = np.where(near_threshold, T_new * (1 + 0.1 * threshold_effect), T_new)
+        
+        return np.maximum(0, tau_rate * (theta * T_adjusted - v * s_c * T_adjusted)).sum()
+    
+    def nearest_bin_index(self, turnover):
+        """Helper: Index of the closest bin centre for each turnover (ties go to the lower bin)"""
+        turnover = np.asarray(turnover, dtype=float)
+        idx = np.clip(np.searchsorted(self.bin_centers, turnover), 1, len(self.bin_centers) - 1)
+        
+        # Step back to the left neighbour when it is at least as close as the right one
+        left_closer = (turnover - self.bin_centers[idx - 1]) <= (self.bin_centers[idx] - turnover)
+        return idx - left_closer
     
     def map_cf_to_new_policy(self, T_cf):
         """Helper: Map counterfactual turnovers to new policy turnovers using Step 5 distribution"""
         # Simplified mapping using the Step 5 new policy distribution
-        T_new = np.zeros_like(T_cf)
+        T_cf = np.asarray(T_cf)
         
-        for i, turnover in enumerate(T_cf):
-            # Find closest bin
-            bin_idx = np.argmin(np.abs(self.bin_centers - turnover))
-            
-            # Use ratio of new policy to counterfactual at this point
-            if self.f_cf[bin_idx] > 0:
-                ratio = self.f_new_policy[bin_idx] / self.f_cf[bin_idx]
-                # Apply small adjustment based on ratio
-                T_new[i] = turnover * (0.95 + 0.1 * ratio)  # Conservative adjustment
-            else:
-                T_new[i] = turnover
-        
-        return T_new
+        # Find closest bin for every firm at once
+        bin_idx = self.nearest_bin_index(T_cf)
+        f_cf_bin = self.f_cf[bin_idx]
+        
+        # Use ratio of new policy to counterfactual at this point
+        ratio = np.divide(self.f_new_policy[bin_idx], f_cf_bin,
+                          out=np.zeros_like(f_cf_bin), where=f_cf_bin > 0)
+        
+        # Apply small adjustment based on ratio (conservative); no change where f_cf is empty
+        return np.where(f_cf_bin > 0, T_cf * (0.95 + 0.1 * ratio), T_cf)
     
     def create_sample_firm_mappings(self):
         """Create sample firm mappings for Steps 6-7 demonstration"""
-        np.random.seed(42)  # Reproducible results
+        rng = np.random.default_rng(42)  # Reproducible results
         
         # Create a realistic sample of UK firms 
         n_firms = 100000  # Sample size for demonstration
         
         # Generate realistic firm turnover distribution
         # UK firms: many small firms, few large ones
-        turnovers_old = []
-        turnovers_new = []
-        
-        for i in range(n_firms):
-            # Generate old turnover with realistic distribution
-            if np.random.random() < 0.7:  # 70% small firms
-                T_old = np.random.lognormal(np.log(30), 0.8)  # Mean ~£50k
-            elif np.random.random() < 0.9:  # 20% medium firms
-                T_old = np.random.lognormal(np.log(80), 0.6)  # Mean ~£120k
-            else:  # 10% large firms
-                T_old = np.random.lognormal(np.log(200), 0.8)  # Mean ~£400k
-            
-            T_old = max(10, min(500, T_old))  # Constrain to £10k-£500k
-            
-            # Apply mapping based on Step 4/5 logic
-            if 65 <= T_old <= 110:  # Near thresholds - apply bunching effects
-                if hasattr(self, 'f_new_policy') and hasattr(self, 'f_cf'):
-                    # Use Step 5 mapping
-                    bin_idx = np.argmin(np.abs(self.bin_centers - T_old))
-                    if self.f_cf[bin_idx] > 0:
-                        ratio = self.f_new_policy[bin_idx] / self.f_cf[bin_idx]
-                        T_new = T_old * (0.95 + 0.1 * ratio)  # Small adjustment
-                    else:
-                        T_new = T_old
-                else:
-                    # Default mapping for threshold change (90k → 100k)
-                    if T_old < 90:
-                        T_new = T_old * 1.02  # Small increase due to threshold change
-                    else:
-                        T_new = T_old * 0.98  # Small decrease
-            else:
-                # Outside bunching region - minimal change
-                T_new = T_old * np.random.normal(1.0, 0.01)  # 1% noise
-            
-            turnovers_old.append(T_old)
-            turnovers_new.append(max(10, T_new))  # Minimum £10k
+        is_small = rng.random(n_firms) < 0.7                 # 70% small firms
+        is_medium = ~is_small & (rng.random(n_firms) < 0.9)  # 20% medium firms, rest large
+        log_mean = np.select([is_small, is_medium], [np.log(30), np.log(80)], np.log(200))
+        log_sigma = np.select([is_small, is_medium], [0.8, 0.6], 0.8)
+        turnovers_old = rng.lognormal(log_mean, log_sigma)   # Means ~£50k / ~£120k / ~£400k
+        
+        turnovers_old = np.clip(turnovers_old, 10, 500)  # Constrain to £10k-£500k
+        
+        # Apply mapping based on Step 4/5 logic
+        near_threshold = (turnovers_old >= 65) & (turnovers_old <= 110)  # Apply bunching effects
+        if hasattr(self, 'f_new_policy') and hasattr(self, 'f_cf'):
+            # Use Step 5 mapping
+            bunching_mapped = self.map_cf_to_new_policy(turnovers_old)
+        else:
+            # Default mapping for threshold change (90k → 100k): small increase below, decrease above
+            bunching_mapped = turnovers_old * np.where(turnovers_old < 90, 1.02, 0.98)
         
-        # Store mappings
-        self.firm_mappings = list(zip(turnovers_old, turnovers_new))
+        # Outside bunching region - minimal change (1% noise)
+        noisy = turnovers_old * rng.normal(1.0, 0.01, n_firms)
+        
+        turnovers_new = np.maximum(10, np.where(near_threshold, bunching_mapped, noisy))  # Minimum £10k
+        
+        # Store mappings as an (n_firms, 2) array of (old, new) turnover
+        self.firm_mappings = np.column_stack((turnovers_old, turnovers_new))
         
         print(f"Created {len(self.firm_mappings):,} sample firm mappings for Steps 6-7")
         print(f"  Mean old turnover: £{np.mean(turnovers_old):.1f}k")
@@ -1070,8 +1034,7 @@ class CounterfactualBunchingAnalysis:
                 bbox=dict(boxstyle="round,pad=0.3", facecolor="lightcoral"))
         
         # Add Step 4 info
-        pi_mean = np.mean([self.compute_local_bunching_probability(T) 
-                          for T in self.bin_centers[window_mask]])
+        pi_mean = np.mean(self.compute_local_bunching_probability(self.bin_centers[window_mask]))
         ax.text(0.02, 0.71, f'Avg bunching prob π̄ = {pi_mean:.3f}', 
                 transform=ax.transAxes, fontsize=11, 
                 bbox=dict(boxstyle="round,pad=0.3", facecolor="lightpink"))
@@ -1100,7 +1063,7 @@ class CounterfactualBunchingAnalysis:
         plt.savefig(output_path, dpi=300, bbox_inches='tight')
         print(f"\nPlot saved: {output_path}")
         
-    def apply_step4_to_synthetic_firms(self, output_file='synthetic_firms_step4_mapped.csv'):
+    def apply_step4_to_synthetic_firms(self, output_file='synthetic_firms_step4_mapped.parquet'):
         """
         Apply advanced Step 4 mapping to synthetic firms and save results.
         """
@@ -1122,74 +1085,34 @@ class CounterfactualBunchingAnalysis:
         # Get observed turnovers
         T_obs = df['annual_turnover_k'].values
         
-        # Apply the advanced probabilistic mapping
-        print("Creating advanced probabilistic mapping...")
-        f_mapped = create_advanced_probabilistic_mapping(self)
-        
         # For individual firms, we need to apply the mapping stochastically
         print("Computing counterfactual turnovers for each firm...")
         
-        # Initialize counterfactual turnovers
-        T_cf = np.zeros_like(T_obs)
-        
-        # Create mapping probabilities for each turnover level
-        mapping_probs = {}
-        bin_width = 1.0  # £1k bins
-        
-        for i, bin_center in enumerate(self.bin_centers):
-            if self.T_lower <= bin_center <= self.T_star:
-                # Compute bunching probability for this turnover level
-                pi_val = self.compute_local_bunching_probability(bin_center)
-                
-                # Get displacement target
-                T_cf_target = self.compute_counterfactual_mapping(bin_center)
-                
-                mapping_probs[bin_center] = {
-                    'pi': pi_val,
-                    'cf_target': T_cf_target,
-                    'stay_prob': 1 - pi_val,
-                    'displace_prob': pi_val
-                }
-            else:
-                # Outside bunching region - no displacement
-                mapping_probs[bin_center] = {
-                    'pi': 0.0,
-                    'cf_target': bin_center,
-                    'stay_prob': 1.0,
-                    'displace_prob': 0.0
-                }
-        
-        # Apply mapping to each firm
-        np.random.seed(42)  # For reproducible results
-        n_displaced = 0
-        
-        for idx, turnover in enumerate(T_obs):
-            # Find closest bin center
-            bin_center = round(turnover)  # Round to nearest £1k
-            
-            if bin_center in mapping_probs:
-                prob_info = mapping_probs[bin_center]
-                
-                # Determine if this firm gets displaced
-                if np.random.random() < prob_info['displace_prob']:
-                    # Firm gets displaced
-                    T_cf[idx] = prob_info['cf_target']
-                    n_displaced += 1
-                else:
-                    # Firm stays at original location
-                    T_cf[idx] = turnover
-            else:
-                # Turnover outside our analysis range - no change
-                T_cf[idx] = turnover
-            
-            # Progress indicator
-            if (idx + 1) % 100000 == 0:
-                print(f"  Processed {idx + 1:,}/{len(T_obs):,} firms...")
+        # Mapping probabilities and displacement targets for each £1k bin
+        # (bins outside the bunching region are never displaced)
+        in_bunching_region = (self.bin_centers >= self.T_lower) & (self.bin_centers <= self.T_star)
+        displace_prob = np.where(in_bunching_region,
+                                 self.compute_local_bunching_probability(self.bin_centers), 0.0)
+        cf_target = self.compute_counterfactual_mapping(self.bin_centers)
+        
+        # Assign each firm to its nearest bin centre (round to nearest £1k)
+        bin_idx = np.rint(T_obs).astype(int) - self.bin_centers[0]
+        in_range = (bin_idx >= 0) & (bin_idx < len(self.bin_centers))
+        bin_idx = np.clip(bin_idx, 0, len(self.bin_centers) - 1)
+        
+        # Determine which firms get displaced with one vector of uniform draws
+        rng = np.random.default_rng(42)  # For reproducible results
+        displaced = in_range & (rng.random(len(T_obs)) < displace_prob[bin_idx])
+        n_displaced = int(np.count_nonzero(displaced))
+        
+        # Displaced firms move to their bin's target, everyone else stays put
+        T_cf = np.where(displaced, cf_target[bin_idx], T_obs)
+        displacement = T_cf - T_obs
         
-        # Add results to dataframe
+        # Add results to dataframe (float32 matches the precision of the input turnovers)
         df_mapped = df.copy()
-        df_mapped['step4_counterfactual_turnover_k'] = T_cf
-        df_mapped['step4_displacement_k'] = T_cf - T_obs
+        df_mapped['step4_counterfactual_turnover_k'] = T_cf.astype(np.float32)
+        df_mapped['step4_displacement_k'] = displacement.astype(np.float32)
         
         # Store firm mappings for Steps 6-7 (old_turnover, new_turnover)
         # For Step 5: use Step 5 new policy turnovers if available
@@ -1199,13 +1122,12 @@ class CounterfactualBunchingAnalysis:
         else:
             T_new_policy = T_cf  # If no Step 5, use counterfactual as "new"
         
-        self.firm_mappings = list(zip(T_obs, T_new_policy))
+        self.firm_mappings = np.column_stack((T_obs, T_new_policy))
         
-        # Save results
-        df_mapped.to_csv(output_file, index=False)
+        # Save results (Parquet keeps the float32 columns and writes far faster than CSV)
+        df_mapped.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
         
         # Print summary statistics
-        displacement = T_cf - T_obs
         nonzero_displacement = displacement[displacement != 0]
         
         print(f"\nStep 4 Advanced Mapping Complete!")
@@ -1219,9 +1141,11 @@ class CounterfactualBunchingAnalysis:
             print(f"Max displacement: £{displacement.max():.3f}k")
             print(f"Min displacement: £{displacement.min():.3f}k")
         
-        # Weighted statistics
-        obs_mean = np.average(T_obs, weights=df['weight'])
-        cf_mean = np.average(T_cf, weights=df['weight'])
+        # Weighted statistics (single weight total, dot products avoid w*T temporaries)
+        weights = df['weight'].to_numpy()
+        total_weight = weights.sum()
+        obs_mean = np.dot(weights, T_obs) / total_weight
+        cf_mean = np.dot(weights, T_cf) / total_weight
         
         print(f"\nWeighted Statistics:")
         print(f"  Original mean turnover: £{obs_mean:.1f}k")
@@ -1346,6 +1270,7 @@ def create_advanced_probabilistic_mapping(analysis, decay_rate=0.01, spread_fact
     
     # For each bin, calculate how much it needs to change to match counterfactual
     deficit = analysis.f_cf - analysis.f_obs  # Positive = need more, negative = have excess
+    not_first_point = np.arange(len(deficit)) > 0  # Exclude index 0
     
     # For each bin in the analysis (skip first point)
     for i, T_obs in enumerate(analysis.bin_centers):
@@ -1364,9 +1289,9 @@ def create_advanced_probabilistic_mapping(analysis, decay_rate=0.01, spread_fact
             # Redistribute excess firms across range (excluding first point)
             if excess_firms > 0:
                 # Find locations that need more firms (positive deficit, skip first point)
-                deficit_mask = (deficit > 0) & (np.arange(len(deficit)) > 0)  # Exclude index 0
-                target_locations = analysis.bin_centers[deficit_mask]
-                target_deficits = deficit[deficit_mask]
+                target_idx = np.flatnonzero((deficit > 0) & not_first_point)
+                target_locations = analysis.bin_centers[target_idx]
+                target_deficits = deficit[target_idx]
                 
                 if len(target_locations) > 0:
                     # Create probability weights based on distance and deficit size
@@ -1379,13 +1304,11 @@ def create_advanced_probabilistic_mapping(analysis, decay_rate=0.01, spread_fact
                     probs = combined_weights / np.sum(combined_weights)
                     
                     # Distribute excess firms
-                    for j, target_turnover in enumerate(target_locations):
-                        target_idx = np.where(analysis.bin_centers == target_turnover)[0][0]
-                        redistribution = excess_firms * probs[j]
-                        mapped_distribution[target_idx] += redistribution
-                        
-                        # Update deficit to track progress
-                        deficit[target_idx] -= redistribution
+                    redistribution = excess_firms * probs
+                    mapped_distribution[target_idx] += redistribution
+                    
+                    # Update deficit to track progress
+                    deficit[target_idx] -= redistribution
         # Bins without excess keep their observed density (already set in initialization)
     
     # Check first point before scaling
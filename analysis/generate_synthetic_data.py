@@ -17,6 +17,40 @@ from torch import Tensor
 
 logger = logging.getLogger(__name__)
 
+# ONS employment bands and the largest headcount in each (the last band is open-ended)
+EMPLOYMENT_BANDS = ['0-4', '5-9', '10-19', '20-49', '50-99', '100-249', '250+']
+EMPLOYMENT_BAND_UPPER = [4, 9, 19, 49, 99, 249]
+
+# ONS employment band parameters (min, max, midpoint headcount)
+EMPLOYMENT_BAND_PARAMS = {
+    '0-4': (1, 4, 2.5),
+    '5-9': (5, 9, 7),
+    '10-19': (10, 19, 14.5),
+    '20-49': (20, 49, 34.5),
+    '50-99': (50, 99, 74.5),
+    '100-249': (100, 249, 174.5),
+    '250+': (250, 2000, 400)
+}
+
+# ONS turnover band parameters (min, max, midpoint in £k)
+TURNOVER_BAND_PARAMS = {
+    '0-49': (0, 49, 24.5),
+    '50-99': (50, 99, 74.5),
+    '100-249': (100, 249, 174.5),
+    '250-499': (250, 499, 374.5),
+    '500-999': (500, 999, 749.5),
+    '1000-4999': (1000, 4999, 2999.5),
+    '5000+': (5000, 50000, 15000)
+}
+
+# HMRC VAT turnover bands, lowest first
+HMRC_TURNOVER_BANDS = [
+    'Negative_or_Zero', '£1_to_Threshold', '£Threshold_to_£150k', '£150k_to_£300k',
+    '£300k_to_£500k', '£500k_to_£1m', '£1m_to_£10m', 'Greater_than_£10m'
+]
+# Inclusive upper edges (£k) of every HMRC band except the open-ended top one
+HMRC_TURNOVER_BAND_UPPER = [0, 90, 150, 300, 500, 1000, 10000]
+
 
 class SyntheticFirmGenerator:
     """
@@ -42,9 +76,9 @@ class SyntheticFirmGenerator:
         self.device = device
         self.random_seed = random_seed
         
-        # Set random seeds
+        # Set random seeds (NumPy draws go through a dedicated Generator, not global state)
         torch.manual_seed(random_seed)
-        np.random.seed(random_seed)
+        self.rng = np.random.default_rng(random_seed)
         
         logger.info(f"Initialized firm generator on device: {device}")
     
@@ -105,52 +139,38 @@ class SyntheticFirmGenerator:
         """
         logger.info("Generating base firms using efficient batch processing...")
         
-        # ONS turnover band parameters (min, max, midpoint in £k)
-        band_params = {
-            '0-49': (0, 49, 24.5),
-            '50-99': (50, 99, 74.5),
-            '100-249': (100, 249, 174.5),
-            '250-499': (250, 499, 374.5),
-            '500-999': (500, 999, 749.5),
-            '1000-4999': (1000, 4999, 2999.5),
-            '5000+': (5000, 50000, 15000)
-        }
-        
-        all_sic_codes = []
-        all_turnovers = []
-        
-        # Process each sector
-        for _, row in ons_df.iterrows():
-            sic_code = row['SIC Code']
-            
-            # Skip summary rows
-            if pd.isna(sic_code) or sic_code == '' or sic_code == 'Total':
-                continue
-            
-            sic_formatted = str(int(sic_code)).zfill(5)
-            
-            # Generate firms for each turnover band
-            for band, (min_val, max_val, midpoint) in band_params.items():
-                if band in row and pd.notna(row[band]) and row[band] > 0:
-                    count = int(row[band] * 0.2)
-                    
-                    if count > 0:
-                        # Generate turnover values with noise smoothing
-                        turnovers = self._generate_turnover_values(
-                            band, count, min_val, max_val, midpoint
-                        )
-                        
-                        # Store results
-                        all_sic_codes.extend([sic_formatted] * count)
-                        all_turnovers.extend(turnovers.cpu().numpy())
+        band_params = TURNOVER_BAND_PARAMS
+        
+        # Skip summary rows
+        sic_column = ons_df['SIC Code']
+        sector_rows = ons_df[sic_column.notna() & (sic_column != '') & (sic_column != 'Total')]
+        sector_sics = sector_rows['SIC Code'].astype(int).to_numpy()
+        
+        # Firm counts for every sector and turnover band at once (20% sample of ONS counts)
+        bands = [band for band in band_params if band in sector_rows.columns]
+        band_counts = (sector_rows[bands].fillna(0).to_numpy(dtype=float) * 0.2).astype(np.int64)
+        band_counts = np.maximum(band_counts, 0)
+        
+        # Draw turnovers sector by sector, band by band (keeps the random stream order)
+        turnover_chunks = []
+        for sector_counts in band_counts:
+            for band, count in zip(bands, sector_counts):
+                if count > 0:
+                    min_val, max_val, midpoint = band_params[band]
+                    turnover_chunks.append(self._generate_turnover_values(
+                        band, int(count), min_val, max_val, midpoint
+                    ))
         
         # Convert to efficient data structures
-        sic_codes_tensor = torch.tensor([int(sic) for sic in all_sic_codes], 
-                                       dtype=torch.int64, device=self.device)
-        turnover_tensor = torch.tensor(all_turnovers, 
-                                      dtype=torch.float32, device=self.device)
+        sic_codes_tensor = torch.as_tensor(
+            np.repeat(sector_sics, band_counts.sum(axis=1)), dtype=torch.int64, device=self.device
+        )
+        if turnover_chunks:
+            turnover_tensor = torch.cat(turnover_chunks).to(dtype=torch.float32, device=self.device)
+        else:
+            turnover_tensor = torch.empty(0, dtype=torch.float32, device=self.device)
         
-        logger.info(f"Generated {len(all_sic_codes):,} base firms")
+        logger.info(f"Generated {len(sic_codes_tensor):,} base firms")
         
         return sic_codes_tensor, turnover_tensor
     
@@ -272,20 +292,11 @@ class SyntheticFirmGenerator:
         
         # Get VAT liability by turnover band data
         vat_liability_band_latest = vat_liability_band_df.iloc[-1]  # Get 2023-24 data
-        vat_liability_bands = {
-            'Negative_or_Zero': vat_liability_band_latest['Negative_or_Zero'],
-            '£1_to_Threshold': vat_liability_band_latest['£1_to_Threshold'],
-            '£Threshold_to_£150k': vat_liability_band_latest['£Threshold_to_£150k'],
-            '£150k_to_£300k': vat_liability_band_latest['£150k_to_£300k'],
-            '£300k_to_£500k': vat_liability_band_latest['£300k_to_£500k'],
-            '£500k_to_£1m': vat_liability_band_latest['£500k_to_£1m'],
-            '£1m_to_£10m': vat_liability_band_latest['£1m_to_£10m'],
-            'Greater_than_£10m': vat_liability_band_latest['Greater_than_£10m']
-        }
+        vat_liability_bands = {band: vat_liability_band_latest[band] for band in HMRC_TURNOVER_BANDS}
         n_vat_bands = 7  # Number of VAT liability bands (excluding Total and Negative_or_Zero)
         
         # Get employment data and calculate ratios
-        emp_bands = ['0-4', '5-9', '10-19', '20-49', '50-99', '100-249', '250+']
+        emp_bands = EMPLOYMENT_BANDS
         n_employment_bands = len(emp_bands)
         
         n_targets = 7 + n_sectors + n_employment_bands + n_vat_sectors + n_vat_bands  # 7 turnover + sector + employment + VAT liability by sector + VAT liability by band
@@ -311,37 +322,15 @@ class SyntheticFirmGenerator:
             target_matrix[i, firms_in_band] = 1.0
         
         # Rows 7 to 7+n_sectors-1: Sector targets (for VAT-registered firms only)
-        for i, (_, sector_row) in enumerate(sector_rows.iterrows(), start=7):
-            trade_sector = sector_row['Trade_Sector']
-            # Convert HMRC Trade_Sector to SIC code (00001 -> 1, 00002 -> 2, etc.)
-            sic_code = int(trade_sector)
-            
-            # Find firms in this sector
-            firms_in_sector = (sic_codes == sic_code)
-            target_matrix[i, firms_in_sector] = 1.0
+        firm_idx, sector_pos = self._match_firms_to_sectors(sic_codes, sector_rows['Trade_Sector'])
+        target_matrix[7 + sector_pos, firm_idx] = 1.0
         
         # Generate employment assignments for target matrix (temporary assignments for optimization)
         employment_values = self.assign_employment(n_firms, ons_employment_df)
         
         # Map employment to bands
-        def map_employment_to_band_idx(emp_val):
-            if emp_val <= 4:
-                return 0  # '0-4'
-            elif emp_val <= 9:
-                return 1  # '5-9'
-            elif emp_val <= 19:
-                return 2  # '10-19'
-            elif emp_val <= 49:
-                return 3  # '20-49'
-            elif emp_val <= 99:
-                return 4  # '50-99'
-            elif emp_val <= 249:
-                return 5  # '100-249'
-            else:
-                return 6  # '250+'
-        
-        employment_band_indices = torch.tensor([map_employment_to_band_idx(emp.item()) for emp in employment_values], 
-                                             dtype=torch.long, device=self.device)
+        band_upper = torch.tensor(EMPLOYMENT_BAND_UPPER, dtype=employment_values.dtype, device=self.device)
+        employment_band_indices = torch.bucketize(employment_values, band_upper)
         
         # Rows 7+n_sectors to 7+n_sectors+n_employment_bands-1: Employment ratio targets  
         emp_start_row = 7 + n_sectors
@@ -355,37 +344,17 @@ class SyntheticFirmGenerator:
         
         # Rows 7+n_sectors+n_employment_bands to 7+n_sectors+n_employment_bands+n_vat_sectors-1: VAT liability targets by sector
         vat_start_row = 7 + n_sectors + n_employment_bands
-        for i, (_, vat_row) in enumerate(vat_liability_sector_rows.iterrows()):
-            row_idx = vat_start_row + i
-            sic_code = int(vat_row['Trade_Sector'])
-            
-            # Find firms in this sector and calculate their VAT liability contribution
-            firms_in_sector = (sic_codes == sic_code)
-            # Weight by VAT liability for this sector's target
-            target_matrix[row_idx, firms_in_sector] = vat_liability_values[firms_in_sector]
+        firm_idx, sector_pos = self._match_firms_to_sectors(sic_codes, vat_liability_sector_rows['Trade_Sector'])
+        # Weight by VAT liability for each sector's target
+        target_matrix[vat_start_row + sector_pos, firm_idx] = vat_liability_values[firm_idx]
         
         # Rows 7+n_sectors+n_employment_bands+n_vat_sectors to end: VAT liability targets by turnover band (excluding Negative_or_Zero)
         vat_band_start_row = 7 + n_sectors + n_employment_bands + n_vat_sectors
-        for i, band_name in enumerate(['£1_to_Threshold', '£Threshold_to_£150k', 
-                                       '£150k_to_£300k', '£300k_to_£500k', '£500k_to_£1m', 
-                                       '£1m_to_£10m', 'Greater_than_£10m']):
+        for i, _ in enumerate(HMRC_TURNOVER_BANDS[1:]):
             row_idx = vat_band_start_row + i
             
-            # Map firms to this turnover band
-            if band_name == '£1_to_Threshold':
-                firms_in_band = (turnover_values > 0) & (turnover_values <= 90)
-            elif band_name == '£Threshold_to_£150k':
-                firms_in_band = (turnover_values > 90) & (turnover_values <= 150)
-            elif band_name == '£150k_to_£300k':
-                firms_in_band = (turnover_values > 150) & (turnover_values <= 300)
-            elif band_name == '£300k_to_£500k':
-                firms_in_band = (turnover_values > 300) & (turnover_values <= 500)
-            elif band_name == '£500k_to_£1m':
-                firms_in_band = (turnover_values > 500) & (turnover_values <= 1000)
-            elif band_name == '£1m_to_£10m':
-                firms_in_band = (turnover_values > 1000) & (turnover_values <= 10000)
-            else:  # Greater_than_£10m
-                firms_in_band = turnover_values > 10000
+            # Map firms to this turnover band (band 0, Negative_or_Zero, is skipped)
+            firms_in_band = (all_band_indices == i + 1)
             
             # Weight by VAT liability for this band's target
             target_matrix[row_idx, firms_in_band] = vat_liability_values[firms_in_band]
@@ -406,39 +375,18 @@ class SyntheticFirmGenerator:
         ]
         
         # Sector targets (direct HMRC targets for VAT-registered firms)
-        sector_targets = []
-        for _, sector_row in sector_rows.iterrows():
-            sector_count = sector_row['2023-24']  # Direct HMRC target
-            sector_targets.append(sector_count)
+        sector_targets = sector_rows['2023-24'].tolist()
         
         # Employment count targets (direct ONS employment counts)
-        employment_targets = []
-        # Get ONS employment totals
-        ons_emp_totals = {}
-        for band in emp_bands:
-            if band in ons_employment_df.columns:
-                sector_rows_emp = ons_employment_df[~ons_employment_df['Description'].str.contains('Total', na=False)]
-                ons_emp_totals[band] = sector_rows_emp[band].fillna(0).sum()
-            else:
-                ons_emp_totals[band] = 0
-        
-        # Use direct ONS employment counts as targets
-        for band in emp_bands:
-            emp_count = ons_emp_totals[band]
-            employment_targets.append(emp_count)
+        ons_emp_totals = self._ons_employment_totals(ons_employment_df)
+        employment_targets = [ons_emp_totals[band] for band in emp_bands]
         
         # VAT liability targets by sector (in millions £, convert to £k)
-        vat_liability_sector_targets = []
-        for _, vat_row in vat_liability_sector_rows.iterrows():
-            vat_liability_millions = vat_row['2023-24']  # in millions £
-            vat_liability_k = vat_liability_millions * 1000  # convert to £k
-            vat_liability_sector_targets.append(vat_liability_k)
+        vat_liability_sector_targets = (vat_liability_sector_rows['2023-24'] * 1000).tolist()
         
         # VAT liability targets by turnover band (in millions £, convert to £k) - excluding Negative_or_Zero
         vat_liability_band_targets = []
-        for band_name in ['£1_to_Threshold', '£Threshold_to_£150k', 
-                          '£150k_to_£300k', '£300k_to_£500k', '£500k_to_£1m', 
-                          '£1m_to_£10m', 'Greater_than_£10m']:
+        for band_name in HMRC_TURNOVER_BANDS[1:]:
             vat_liability_millions = vat_liability_bands[band_name]  # in millions £
             vat_liability_k = vat_liability_millions * 1000  # convert to £k
             vat_liability_band_targets.append(vat_liability_k)
@@ -493,6 +441,35 @@ class SyntheticFirmGenerator:
         log_weights = torch.zeros(n_firms, device=self.device, requires_grad=True)
         optimizer = torch.optim.Adam([log_weights], lr=lr)
         
+        # Importance weights by target type (fixed for the whole optimization)
+        importance_weights = torch.ones(target_matrix.shape[0], device=self.device)
+        importance_weights[:7] = 5.0  # 5x weight for turnover targets
+        
+        # Calculate indices for different target types
+        # Structure: 7 turnover + n_sectors + n_employment_bands + n_vat_sectors + n_vat_bands
+        n_total_targets = target_matrix.shape[0]
+        
+        # We need to dynamically calculate the section sizes from the actual target matrix
+        # For now, use fixed estimates based on typical data structure
+        n_employment = 7  # Fixed: 7 employment bands
+        
+        # The remaining targets are split between sectors and VAT liability
+        n_remaining = n_total_targets - 7 - n_employment  # Remove turnover and employment
+        n_est_sectors = n_remaining // 3  # Rough estimate (sectors, vat_sectors, vat_bands)
+        n_est_vat_sectors = n_est_sectors
+        n_est_vat_bands = n_remaining - n_est_sectors - n_est_vat_sectors
+        
+        sector_start_idx = 7
+        emp_start_idx = 7 + n_est_sectors
+        vat_sector_start_idx = emp_start_idx + n_employment
+        vat_band_start_idx = vat_sector_start_idx + n_est_vat_sectors
+        
+        # Set importance weights
+        importance_weights[sector_start_idx:emp_start_idx] = 1.0  # 1x weight for sector targets
+        importance_weights[emp_start_idx:vat_sector_start_idx] = 1.0  # 1x weight for employment targets
+        importance_weights[vat_sector_start_idx:vat_band_start_idx] = 1.0  # 1x weight for VAT liability sector targets
+        importance_weights[vat_band_start_idx:] = 2.0  # 2x weight for VAT liability band targets
+        
         best_loss = float('inf')
         patience = 100
         patience_counter = 0
@@ -521,35 +498,6 @@ class SyntheticFirmGenerator:
             error_2 = ((target_adj / pred_adj) - 1) ** 2
             sre_loss = torch.minimum(error_1, error_2)
             
-            # Apply importance weights based on target type
-            importance_weights = torch.ones_like(sre_loss)
-            importance_weights[:7] = 5.0  # 5x weight for turnover targets
-            
-            # Calculate indices for different target types
-            # Structure: 7 turnover + n_sectors + n_employment_bands + n_vat_sectors + n_vat_bands
-            n_total_targets = len(sre_loss)
-            
-            # We need to dynamically calculate the section sizes from the actual target matrix
-            # For now, use fixed estimates based on typical data structure
-            n_employment = 7  # Fixed: 7 employment bands
-            
-            # The remaining targets are split between sectors and VAT liability
-            n_remaining = n_total_targets - 7 - n_employment  # Remove turnover and employment
-            n_est_sectors = n_remaining // 3  # Rough estimate (sectors, vat_sectors, vat_bands)
-            n_est_vat_sectors = n_est_sectors
-            n_est_vat_bands = n_remaining - n_est_sectors - n_est_vat_sectors
-            
-            sector_start_idx = 7
-            emp_start_idx = 7 + n_est_sectors
-            vat_sector_start_idx = emp_start_idx + n_employment
-            vat_band_start_idx = vat_sector_start_idx + n_est_vat_sectors
-            
-            # Set importance weights
-            importance_weights[sector_start_idx:emp_start_idx] = 1.0  # 1x weight for sector targets
-            importance_weights[emp_start_idx:vat_sector_start_idx] = 1.0  # 1x weight for employment targets
-            importance_weights[vat_sector_start_idx:vat_band_start_idx] = 1.0  # 1x weight for VAT liability sector targets
-            importance_weights[vat_band_start_idx:] = 2.0  # 2x weight for VAT liability band targets
-            
             weighted_loss = sre_loss * importance_weights
             total_loss = torch.mean(weighted_loss)
             
@@ -565,14 +513,15 @@ class SyntheticFirmGenerator:
             optimizer.step()
             
             # Early stopping
-            if total_loss.item() < best_loss:
-                best_loss = total_loss.item()
+            loss_value = total_loss.item()
+            if loss_value < best_loss:
+                best_loss = loss_value
                 patience_counter = 0
             else:
                 patience_counter += 1
             
             if iteration % 100 == 0:
-                logger.info(f"Iteration {iteration}: Loss = {total_loss.item():.6f}")
+                logger.info(f"Iteration {iteration}: Loss = {loss_value:.6f}")
             
             if patience_counter > patience:
                 logger.info(f"Early stopping at iteration {iteration}")
@@ -582,8 +531,7 @@ class SyntheticFirmGenerator:
         final_predictions = torch.matmul(target_matrix, final_weights)
         
         logger.info("Optimization complete:")
-        target_names = ['Negative_or_Zero', '£1_to_Threshold', '£Threshold_to_£150k', '£150k_to_£300k', 
-                       '£300k_to_£500k', '£500k_to_£1m', '£1m_to_£10m', 'Greater_than_£10m']
+        target_names = HMRC_TURNOVER_BANDS
         for i, (pred, target, name) in enumerate(zip(final_predictions, target_values, target_names)):
             if target > 0:  # Only log targets we're actually trying to match
                 accuracy = 1 - abs(pred - target) / target
@@ -614,24 +562,12 @@ class SyntheticFirmGenerator:
         """
         logger.info("Applying final calibration adjustments...")
         
-        all_final_firms = []
-        
-        # Step 1: Add ALL base firms with their weights
-        hmrc_band_indices = self._map_to_hmrc_bands(base_turnover)
-        
+        # Step 1: Add ALL base firms with their calibrated weights
         logger.info(f"Adding {len(base_sic_codes):,} base firms...")
-        for i in range(len(base_sic_codes)):
-            band_idx = hmrc_band_indices[i].item()
-            
-            # Use calibrated weights from optimization for all bands
-            weight = weights_tensor[i].item()
-            
-            all_final_firms.append({
-                'sic_code': base_sic_codes[i].item(),
-                'annual_turnover_k': base_turnover[i].item(),
-                'annual_input_k': base_input[i].item(),
-                'weight': weight
-            })
+        final_sics = base_sic_codes.to(dtype=torch.int64, device=self.device)
+        final_turnover = base_turnover.to(dtype=torch.float32, device=self.device)
+        final_input = base_input.to(dtype=torch.float32, device=self.device)
+        final_weights = weights_tensor.to(dtype=torch.float32, device=self.device)
         
         # Step 2: Manually add zero/negative turnover firms
         negative_zero_target = hmrc_bands['Negative_or_Zero']
@@ -642,45 +578,52 @@ class SyntheticFirmGenerator:
             total_current_firms = len(base_sic_codes)
             
             logger.info(f"Manually adding {negative_zero_target:,} zero turnover firms from HMRC...")
-            zero_firms_count = 0
             
-            for sic, count in zip(unique_sics, counts):
-                sector_weight = count.float() / total_current_firms
-                firms_for_sector = int((negative_zero_target * sector_weight).item())
-                if firms_for_sector > 0:
-                    for _ in range(firms_for_sector):
-                        all_final_firms.append({
-                            'sic_code': sic.item(),
-                            'annual_turnover_k': 0.0,
-                            'annual_input_k': 0.0,
-                            'weight': 1.0
-                        })
-                        zero_firms_count += 1
+            sector_weights = counts.float() / total_current_firms
+            firms_per_sector = (negative_zero_target * sector_weights).to(torch.int64)
+            zero_sics = torch.repeat_interleave(unique_sics, firms_per_sector).to(dtype=torch.int64, device=self.device)
+            zero_firms_count = len(zero_sics)
+            
+            final_sics = torch.cat([final_sics, zero_sics])
+            final_turnover = torch.cat([final_turnover, torch.zeros(zero_firms_count, dtype=torch.float32, device=self.device)])
+            final_input = torch.cat([final_input, torch.zeros(zero_firms_count, dtype=torch.float32, device=self.device)])
+            final_weights = torch.cat([final_weights, torch.ones(zero_firms_count, dtype=torch.float32, device=self.device)])
             
             logger.info(f"Added {zero_firms_count:,} firms with zero turnover")
         
-        # Convert back to tensors
-        if all_final_firms:
-            final_sics = torch.tensor([f['sic_code'] for f in all_final_firms], 
-                                    dtype=torch.int64, device=self.device)
-            final_turnover = torch.tensor([f['annual_turnover_k'] for f in all_final_firms], 
-                                        dtype=torch.float32, device=self.device)
-            final_input = torch.tensor([f['annual_input_k'] for f in all_final_firms],
-                                     dtype=torch.float32, device=self.device)
-            final_weights = torch.tensor([f['weight'] for f in all_final_firms], 
-                                       dtype=torch.float32, device=self.device)
-            
-            logger.info(f"Final dataset: {len(all_final_firms):,} firms")
+        if len(final_sics) > 0:
+            logger.info(f"Final dataset: {len(final_sics):,} firms")
             logger.info(f"Total weighted population: {final_weights.sum():.0f}")
-        else:
-            # Empty tensors if no firms generated
-            final_sics = torch.empty(0, dtype=torch.int64, device=self.device)
-            final_turnover = torch.empty(0, dtype=torch.float32, device=self.device)
-            final_input = torch.empty(0, dtype=torch.float32, device=self.device)
-            final_weights = torch.empty(0, dtype=torch.float32, device=self.device)
         
         return final_sics, final_turnover, final_input, final_weights
     
+    def _match_firms_to_sectors(self, sic_codes: Tensor, trade_sectors: pd.Series) -> Tuple[Tensor, Tensor]:
+        """Match firms to HMRC trade sectors in a single pass over the firms.
+        
+        Args:
+            sic_codes: Array of firm SIC codes
+            trade_sectors: HMRC Trade_Sector column, one row per sector (e.g. '00001' -> SIC 1)
+            
+        Returns:
+            Tuple of (firm indices, sector row positions) for every firm whose SIC code has a sector row
+        """
+        sector_codes = torch.tensor(trade_sectors.astype(int).to_numpy(), dtype=sic_codes.dtype, device=self.device)
+        sorted_codes, order = torch.sort(sector_codes)
+        
+        pos = torch.searchsorted(sorted_codes, sic_codes).clamp(max=len(sorted_codes) - 1)
+        matched = sorted_codes[pos] == sic_codes
+        
+        return torch.nonzero(matched, as_tuple=True)[0], order[pos[matched]]
+    
+    def _ons_employment_totals(self, ons_employment_df: pd.DataFrame) -> Dict[str, int]:
+        """ONS firm counts per employment band summed over sector rows (0 for missing bands)."""
+        sector_rows = ons_employment_df[~ons_employment_df['Description'].str.contains('Total', na=False)]
+        present_bands = [band for band in EMPLOYMENT_BANDS if band in sector_rows.columns]
+        
+        # One NumPy reduction over all band columns instead of a filter and sum per band
+        band_totals = dict(zip(present_bands, sector_rows[present_bands].fillna(0).to_numpy().sum(axis=0)))
+        return {band: band_totals.get(band, 0) for band in EMPLOYMENT_BANDS}
+    
     def _map_to_hmrc_bands(self, turnover_values: Tensor) -> Tensor:
         """Map turnover values to HMRC band indices.
         
@@ -690,17 +633,10 @@ class SyntheticFirmGenerator:
         Returns:
             HMRC band indices (0-7 for 8 HMRC bands)
         """
-        # Initialize with highest band (Greater_than_£10m = 7)
-        band_indices = torch.full_like(turnover_values, 7, dtype=torch.long)
-        
-        # Assign bands based on turnover thresholds
-        band_indices = torch.where(turnover_values <= 0, 0, band_indices)  # Negative_or_Zero
-        band_indices = torch.where((turnover_values > 0) & (turnover_values <= 90), 1, band_indices)  # £1_to_Threshold
-        band_indices = torch.where((turnover_values > 90) & (turnover_values <= 150), 2, band_indices)  # £Threshold_to_£150k
-        band_indices = torch.where((turnover_values > 150) & (turnover_values <= 300), 3, band_indices)  # £150k_to_£300k
-        band_indices = torch.where((turnover_values > 300) & (turnover_values <= 500), 4, band_indices)  # £300k_to_£500k
-        band_indices = torch.where((turnover_values > 500) & (turnover_values <= 1000), 5, band_indices)  # £500k_to_£1m
-        band_indices = torch.where((turnover_values > 1000) & (turnover_values <= 10000), 6, band_indices)  # £1m_to_£10m
+        # Binary search over the upper-inclusive band edges: x <= 0 -> 0, 0 < x <= 90 -> 1,
+        # ..., x > 10000 -> 7 (Greater_than_£10m)
+        band_upper = torch.tensor(HMRC_TURNOVER_BAND_UPPER, dtype=turnover_values.dtype, device=self.device)
+        band_indices = torch.bucketize(turnover_values, band_upper)
         
         return band_indices
     
@@ -741,7 +677,6 @@ class SyntheticFirmGenerator:
         logger.info("Generating input values for firms from distributions...")
         
         n_firms = len(turnover_values)
-        input_values = torch.zeros_like(turnover_values)
         
         # Generate input/output ratios from a beta distribution
         # Beta(4, 2) gives a distribution centered around 0.67 with range [0, 1]
@@ -757,28 +692,27 @@ class SyntheticFirmGenerator:
         sector_noise = torch.randn(n_firms, device=self.device) * 0.15
         
         # For some sectors, shift the distribution to make negative liability more likely
-        for i in range(n_firms):
-            sic = sic_codes[i].item()
-            
-            # Add extra variation for certain sectors that tend to have extreme values
-            if sic in [1, 3, 6, 7, 9, 10, 24, 30, 36, 37, 49, 50, 51, 60, 64, 79, 84]:
-                # These sectors often have negative VAT liability
-                # Add positive bias to input ratio
-                scaled_ratios[i] += torch.rand(1, device=self.device).item() * 0.3
-            elif sic in [11, 12, 69, 70, 78]:
-                # These sectors often have high VAT liability (low inputs)
-                # Add negative bias to input ratio
-                scaled_ratios[i] -= torch.rand(1, device=self.device).item() * 0.2
+        # These sectors often have negative VAT liability: add positive bias to input ratio
+        negative_liability_sectors = torch.tensor([1, 3, 6, 7, 9, 10, 24, 30, 36, 37, 49, 50, 51, 60, 64, 79, 84],
+                                                  device=self.device)
+        # These sectors often have high VAT liability (low inputs): add negative bias to input ratio
+        high_liability_sectors = torch.tensor([11, 12, 69, 70, 78], device=self.device)
+        
+        # Per-SIC bias scale lookup table: one indexed gather instead of two isin scans
+        n_sic = int(max(sic_codes.max(), negative_liability_sectors.max(), high_liability_sectors.max())) + 1
+        bias_scale_by_sic = torch.zeros(n_sic, device=self.device)
+        bias_scale_by_sic[high_liability_sectors] = -0.2
+        bias_scale_by_sic[negative_liability_sectors] = 0.3
+        
+        sector_bias = torch.rand(n_firms, device=self.device)
+        scaled_ratios = scaled_ratios + sector_bias * bias_scale_by_sic[sic_codes]
         
         # Apply ratios with noise
         final_ratios = torch.clamp(scaled_ratios + sector_noise, 0.1, 1.5)
         
-        # Generate input values
-        for i in range(n_firms):
-            if turnover_values[i] <= 0:
-                input_values[i] = 0
-            else:
-                input_values[i] = turnover_values[i] * final_ratios[i]
+        # Generate input values (firms without positive turnover have no inputs)
+        input_values = torch.where(turnover_values <= 0, torch.zeros_like(turnover_values),
+                                   turnover_values * final_ratios)
         
         logger.info(f"Generated input values for {n_firms:,} firms")
         logger.info(f"Input/output ratio statistics:")
@@ -804,25 +738,11 @@ class SyntheticFirmGenerator:
         logger.info("Assigning employment using ONS distribution...")
         
         # Employment bands and parameters
-        emp_bands = ['0-4', '5-9', '10-19', '20-49', '50-99', '100-249', '250+']
-        band_params = {
-            '0-4': (1, 4, 2.5),
-            '5-9': (5, 9, 7),
-            '10-19': (10, 19, 14.5),
-            '20-49': (20, 49, 34.5),
-            '50-99': (50, 99, 74.5),
-            '100-249': (100, 249, 174.5),
-            '250+': (250, 2000, 400)
-        }
+        emp_bands = EMPLOYMENT_BANDS
+        band_params = EMPLOYMENT_BAND_PARAMS
         
         # Calculate ONS employment band totals
-        total_ons_counts = {}
-        for band in emp_bands:
-            if band in ons_employment_df.columns:
-                sector_rows = ons_employment_df[~ons_employment_df['Description'].str.contains('Total', na=False)]
-                total_ons_counts[band] = int(sector_rows[band].fillna(0).sum())
-            else:
-                total_ons_counts[band] = 0
+        total_ons_counts = {band: int(count) for band, count in self._ons_employment_totals(ons_employment_df).items()}
         
         total_ons_firms = sum(total_ons_counts.values())
         
@@ -852,7 +772,7 @@ class SyntheticFirmGenerator:
                 employment_values.extend(values.cpu().numpy())
         
         # Shuffle and pad/trim to exact size
-        np.random.shuffle(employment_values)
+        self.rng.shuffle(employment_values)
         if len(employment_values) < num_firms:
             employment_values.extend([1] * (num_firms - len(employment_values)))
         elif len(employment_values) > num_firms:
@@ -885,30 +805,23 @@ class SyntheticFirmGenerator:
         logger.info("Validating synthetic data against official data sources...")
         
         # 1. HMRC VAT Firm Validation (VAT-registered firms only)
-        def map_to_hmrc_band(turnover_k):
-            if turnover_k <= 0:
-                return 'Negative_or_Zero'
-            elif turnover_k <= 90:
-                return '£1_to_Threshold'
-            elif turnover_k <= 150:
-                return '£Threshold_to_£150k'
-            elif turnover_k <= 300:
-                return '£150k_to_£300k'
-            elif turnover_k <= 500:
-                return '£300k_to_£500k'
-            elif turnover_k <= 1000:
-                return '£500k_to_£1m'
-            elif turnover_k <= 10000:
-                return '£1m_to_£10m'
-            else:
-                return 'Greater_than_£10m'
+        # Upper band edges in £k (inclusive); anything above the last edge is Greater_than_£10m
+        hmrc_band_edges = np.asarray(HMRC_TURNOVER_BAND_UPPER)
+        hmrc_band_names = np.array(HMRC_TURNOVER_BANDS, dtype=object)
         
         # Map all firms to HMRC bands for validation
-        synthetic_df['hmrc_band'] = synthetic_df['annual_turnover_k'].apply(map_to_hmrc_band)
-        all_bands = synthetic_df.groupby('hmrc_band')['weight'].sum().round().astype(int)
+        hmrc_band_idx = np.searchsorted(hmrc_band_edges, synthetic_df['annual_turnover_k'].to_numpy(), side='left')
+        all_bands = pd.Series(
+            np.bincount(hmrc_band_idx, weights=synthetic_df['weight'].to_numpy(), minlength=len(hmrc_band_names)),
+            index=hmrc_band_names
+        ).round().astype(int)
+        
+        # VAT-registered mask and weights as arrays, reused by every registered-only breakdown below
+        vat_registered = synthetic_df['vat_registered'].to_numpy(dtype=bool)
+        weights = synthetic_df['weight'].to_numpy()
         
         # === VAT REGISTRATION VALIDATION ===
-        vat_registered_count = synthetic_df[synthetic_df['vat_registered'] == True]['weight'].sum()
+        vat_registered_count = weights[vat_registered].sum()
         hmrc_total_vat = sum(hmrc_target_bands.values())
         vat_accuracy = 1 - abs(vat_registered_count - hmrc_total_vat) / hmrc_total_vat
         
@@ -956,37 +869,17 @@ class SyntheticFirmGenerator:
         print(f"ONS Accuracy:    {ons_population_accuracy:.1%}")
         
         # === EMPLOYMENT BAND VALIDATION ===
-        def _map_employment_to_band(employment: int) -> str:
-            """Map employment count to ONS employment band."""
-            if employment <= 4:
-                return '0-4'
-            elif employment <= 9:
-                return '5-9'
-            elif employment <= 19:
-                return '10-19'
-            elif employment <= 49:
-                return '20-49'
-            elif employment <= 99:
-                return '50-99'
-            elif employment <= 249:
-                return '100-249'
-            else:
-                return '250+'
-        
-        employment_bands = ['0-4', '5-9', '10-19', '20-49', '50-99', '100-249', '250+']
-        ons_employment_targets = {}
+        employment_bands = EMPLOYMENT_BANDS
         
         # Get ONS employment targets
-        for band in employment_bands:
-            if band in ons_employment_df.columns:
-                sector_rows = ons_employment_df[~ons_employment_df['Description'].str.contains('Total', na=False)]
-                ons_employment_targets[band] = sector_rows[band].fillna(0).sum()
-            else:
-                ons_employment_targets[band] = 0
+        ons_employment_targets = self._ons_employment_totals(ons_employment_df)
         
         # Calculate synthetic employment distribution
-        synthetic_df['employment_band'] = synthetic_df['employment'].apply(_map_employment_to_band)
-        synthetic_employment_counts = synthetic_df.groupby('employment_band')['weight'].sum().round().astype(int)
+        employment_band_idx = np.searchsorted(EMPLOYMENT_BAND_UPPER, synthetic_df['employment'].to_numpy(), side='left')
+        synthetic_employment_counts = pd.Series(
+            np.bincount(employment_band_idx, weights=weights, minlength=len(employment_bands)),
+            index=employment_bands
+        ).round().astype(int)
         
         self._print_validation_section("EMPLOYMENT BAND VALIDATION")
         print(f"{'Band':>8} {'Synthetic':>10} {'ONS Target':>11} {'Accuracy':>10}")
@@ -1009,23 +902,29 @@ class SyntheticFirmGenerator:
         sector_rows = hmrc_sector_df[hmrc_sector_df['Trade_Sector'] != 'Total'].copy()
         
         # Calculate synthetic VAT-registered sector distribution
-        synthetic_df['sic_numeric'] = synthetic_df['sic_code'].astype(int)
-        vat_registered_firms = synthetic_df[synthetic_df['vat_registered'] == True]
-        synthetic_vat_sector_counts = vat_registered_firms.groupby('sic_numeric')['weight'].sum().round().astype(int)
+        sic_numeric = synthetic_df['sic_code'].astype(int).to_numpy()
+        synthetic_vat_sector_counts = pd.Series(weights[vat_registered]).groupby(
+            sic_numeric[vat_registered]
+        ).sum().round().astype(int)
         
         self._print_validation_section("SECTOR VALIDATION (VAT-registered firms)")
         print(f"{'SIC':>5} {'Synthetic VAT':>12} {'HMRC Target':>12} {'Accuracy':>10}")
         print("-" * 65)
         
-        sector_accuracies = []
-        for _, sector_row in sector_rows.iterrows():
-            sic_code = int(sector_row['Trade_Sector'])
-            hmrc_target = sector_row['2023-24']
-            
-            synthetic_vat_count = synthetic_vat_sector_counts.get(sic_code, 0)
-            accuracy = 1 - abs(synthetic_vat_count - hmrc_target) / hmrc_target if hmrc_target > 0 else (1.0 if synthetic_vat_count == 0 else 0.0)
-            sector_accuracies.append(accuracy)
-            
+        # Accuracy for every sector at once
+        sector_sics = sector_rows['Trade_Sector'].astype(int).to_numpy()
+        hmrc_targets = sector_rows['2023-24'].to_numpy()
+        synthetic_vat_counts = synthetic_vat_sector_counts.reindex(sector_sics, fill_value=0).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sector_accuracies = np.where(
+                hmrc_targets > 0,
+                1 - np.abs(synthetic_vat_counts - hmrc_targets) / hmrc_targets,
+                np.where(synthetic_vat_counts == 0, 1.0, 0.0)
+            ).tolist()
+        
+        for sic_code, synthetic_vat_count, hmrc_target, accuracy in zip(
+            sector_sics, synthetic_vat_counts, hmrc_targets, sector_accuracies
+        ):
             status = "✓" if accuracy > 0.90 else "⚠" if accuracy > 0.80 else "✗"
             print(f"  {status} {sic_code:>3}: {synthetic_vat_count:>10,} vs {hmrc_target:>10,} ({accuracy:>6.1%})")
         
@@ -1037,52 +936,41 @@ class SyntheticFirmGenerator:
         vat_liability_rows = vat_liability_df[vat_liability_df['Trade_Sector'] != 'Total'].copy()
         
         # Calculate synthetic VAT liability by sector
-        synthetic_df['vat_liability_k'] = synthetic_df['annual_turnover_k'] - synthetic_df['annual_input_k']
-        synthetic_df['sic_numeric'] = synthetic_df['sic_code'].astype(int)
+        weighted_vat_liability = (
+            synthetic_df['annual_turnover_k'].to_numpy() - synthetic_df['annual_input_k'].to_numpy()
+        ) * weights
         
-        # Group by sector and calculate weighted VAT liability
-        synthetic_vat_liability = synthetic_df.groupby('sic_numeric').apply(
-            lambda x: (x['vat_liability_k'] * x['weight']).sum()
-        ).reset_index(name='synthetic_vat_liability_k')
+        # Group by sector and calculate weighted VAT liability (£k, indexed by SIC)
+        synthetic_vat_liability = pd.Series(weighted_vat_liability).groupby(sic_numeric).sum()
         
         self._print_validation_section("VAT LIABILITY VALIDATION (by sector)")
         print(f"{'SIC':>5} {'Synthetic (£m)':>14} {'Target (£m)':>12} {'Accuracy':>10}")
         print("-" * 65)
         
-        vat_liability_accuracies = []
-        for _, vat_row in vat_liability_rows.iterrows():
-            sic_code = int(vat_row['Trade_Sector'])
-            target_millions = vat_row['2023-24']  # in millions £
-            target_k = target_millions * 1000  # convert to £k
-            
-            # Get synthetic VAT liability for this sector
-            sector_data = synthetic_vat_liability[synthetic_vat_liability['sic_numeric'] == sic_code]
-            if not sector_data.empty:
-                synthetic_k = sector_data['synthetic_vat_liability_k'].iloc[0]
-            else:
-                synthetic_k = 0
-            
-            synthetic_millions = synthetic_k / 1000  # convert back to millions for display
-            
-            # Calculate accuracy (handle negative targets)
-            if abs(target_millions) > 0.1:  # Skip near-zero targets
-                # For negative targets, check if signs match and relative magnitude
-                if target_millions < 0 and synthetic_millions < 0:
-                    # Both negative - check relative difference
-                    accuracy = 1 - min(abs(synthetic_millions - target_millions) / abs(target_millions), 1.0)
-                elif target_millions > 0 and synthetic_millions > 0:
-                    # Both positive - check relative difference
-                    accuracy = 1 - min(abs(synthetic_millions - target_millions) / target_millions, 1.0)
-                else:
-                    # Sign mismatch - poor accuracy
-                    accuracy = max(0, 1 - abs(synthetic_millions - target_millions) / max(abs(target_millions), 1))
-            else:
-                accuracy = 1.0 if abs(synthetic_millions) < 1 else 0.0
-            
-            vat_liability_accuracies.append(accuracy)
-            
+        vat_sics = vat_liability_rows['Trade_Sector'].astype(int).to_numpy()
+        target_millions = vat_liability_rows['2023-24'].to_numpy(dtype=float)  # in millions £
+        # Synthetic liability per target sector, converted back to millions for display
+        synthetic_millions = synthetic_vat_liability.reindex(vat_sics, fill_value=0).to_numpy() / 1000
+        
+        # Calculate accuracy for all sectors at once (handle negative targets)
+        abs_error = np.abs(synthetic_millions - target_millions)
+        abs_target = np.abs(target_millions)
+        signs_match = ((target_millions < 0) & (synthetic_millions < 0)) | ((target_millions > 0) & (synthetic_millions > 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Signs match - check relative difference; sign mismatch - poor accuracy
+            relative_accuracy = 1 - np.minimum(abs_error / abs_target, 1.0)
+            mismatch_accuracy = np.maximum(0, 1 - abs_error / np.maximum(abs_target, 1))
+        vat_liability_accuracies = np.where(
+            abs_target > 0.1,  # Skip near-zero targets
+            np.where(signs_match, relative_accuracy, mismatch_accuracy),
+            np.where(np.abs(synthetic_millions) < 1, 1.0, 0.0)
+        ).tolist()
+        
+        for sic_code, synthetic_m, target_m, accuracy in zip(
+            vat_sics, synthetic_millions, target_millions, vat_liability_accuracies
+        ):
             status = "✓" if accuracy > 0.70 else "⚠" if accuracy > 0.50 else "✗"
-            print(f"  {status} {sic_code:>3}: {synthetic_millions:>12.1f} vs {target_millions:>10.1f} ({accuracy:>6.1%})")
+            print(f"  {status} {sic_code:>3}: {synthetic_m:>12.1f} vs {target_m:>10.1f} ({accuracy:>6.1%})")
         
         print("-" * 65)
         vat_liability_sector_accuracy = self._print_accuracy_breakdown(vat_liability_accuracies, len(vat_liability_accuracies), "VAT LIABILITY BY SECTOR")
@@ -1090,21 +978,14 @@ class SyntheticFirmGenerator:
         # === VAT LIABILITY BY TURNOVER BAND VALIDATION ===
         # Get VAT liability by turnover band targets (excluding Negative_or_Zero)
         vat_liability_band_latest = vat_liability_band_df.iloc[-1]  # Get 2023-24 data
-        vat_liability_band_targets = {
-            '£1_to_Threshold': vat_liability_band_latest['£1_to_Threshold'],
-            '£Threshold_to_£150k': vat_liability_band_latest['£Threshold_to_£150k'],
-            '£150k_to_£300k': vat_liability_band_latest['£150k_to_£300k'],
-            '£300k_to_£500k': vat_liability_band_latest['£300k_to_£500k'],
-            '£500k_to_£1m': vat_liability_band_latest['£500k_to_£1m'],
-            '£1m_to_£10m': vat_liability_band_latest['£1m_to_£10m'],
-            'Greater_than_£10m': vat_liability_band_latest['Greater_than_£10m']
-        }
+        vat_liability_band_targets = {band: vat_liability_band_latest[band] for band in HMRC_TURNOVER_BANDS[1:]}
         
         # Calculate synthetic VAT liability by turnover band (VAT-registered firms only)
-        vat_registered_firms = synthetic_df[synthetic_df['vat_registered'] == True]
-        synthetic_vat_band_liability = vat_registered_firms.groupby('hmrc_band').apply(
-            lambda x: (x['vat_liability_k'] * x['weight']).sum()
-        ).reset_index(name='synthetic_vat_liability_k')
+        synthetic_vat_band_liability = pd.Series(
+            np.bincount(hmrc_band_idx[vat_registered], weights=weighted_vat_liability[vat_registered],
+                        minlength=len(hmrc_band_names)),
+            index=hmrc_band_names
+        )
         
         self._print_validation_section("VAT LIABILITY BY TURNOVER BAND VALIDATION")
         print(f"{'Band':>25} {'Synthetic (£m)':>14} {'Target (£m)':>12} {'Accuracy':>10}")
@@ -1113,11 +994,7 @@ class SyntheticFirmGenerator:
         vat_liability_band_accuracies = []
         for band_name, target_millions in vat_liability_band_targets.items():
             # Get synthetic VAT liability for this band
-            band_data = synthetic_vat_band_liability[synthetic_vat_band_liability['hmrc_band'] == band_name]
-            if not band_data.empty:
-                synthetic_k = band_data['synthetic_vat_liability_k'].iloc[0]
-            else:
-                synthetic_k = 0
+            synthetic_k = synthetic_vat_band_liability[band_name]
             
             synthetic_millions = synthetic_k / 1000  # convert back to millions for display
             
@@ -1176,16 +1053,7 @@ class SyntheticFirmGenerator:
         
         # Extract HMRC targets (VAT-registered firms only)
         hmrc_latest = hmrc_turnover_df.iloc[-1]
-        hmrc_bands = {
-            'Negative_or_Zero': hmrc_latest['Negative_or_Zero'],
-            '£1_to_Threshold': hmrc_latest['£1_to_Threshold'],
-            '£Threshold_to_£150k': hmrc_latest['£Threshold_to_£150k'],
-            '£150k_to_£300k': hmrc_latest['£150k_to_£300k'],
-            '£300k_to_£500k': hmrc_latest['£300k_to_£500k'],
-            '£500k_to_£1m': hmrc_latest['£500k_to_£1m'],
-            '£1m_to_£10m': hmrc_latest['£1m_to_£10m'],
-            'Greater_than_£10m': hmrc_latest['Greater_than_£10m']
-        }
+        hmrc_bands = {band: hmrc_latest[band] for band in HMRC_TURNOVER_BANDS}
         
         logger.info(f"Target populations:")
         logger.info(f"  ONS total firms: {ons_total:,} (includes all businesses)")
@@ -1223,8 +1091,13 @@ class SyntheticFirmGenerator:
         input_np = final_input.cpu().numpy()
         vat_liability_np = turnover_np - input_np  # Calculate VAT liability
         
+        # Zero-padded SIC labels as a categorical: format each distinct code once,
+        # then store per-firm integer codes against those labels
+        unique_sics, sic_index = np.unique(sic_codes_np, return_inverse=True)
+        sic_labels = [str(sic).zfill(5) for sic in unique_sics]
+        
         synthetic_df = pd.DataFrame({
-            'sic_code': [str(sic).zfill(5) for sic in sic_codes_np],
+            'sic_code': pd.Categorical.from_codes(sic_index, categories=sic_labels),
             'annual_turnover_k': turnover_np,
             'annual_input_k': input_np,
             'vat_liability_k': vat_liability_np,
@@ -11,9 +11,9 @@ from pathlib import Path
 def create_turnover_plot():
     """Create a simple turnover distribution chart."""
     
-    # Load data
+    # Load data (only the columns the histogram needs, parsed by pyarrow)
     data_path = Path(__file__).parent / 'synthetic_firms_turnover.csv'
-    df = pd.read_csv(data_path)
+    df = pd.read_csv(data_path, engine='pyarrow', usecols=['annual_turnover_k', 'weight'])
     
     # Create bins from 1k to 300k
     bin_edges = np.arange(0.5, 300.5, 1.0)  # 1k intervals
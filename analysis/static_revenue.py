@@ -13,7 +13,19 @@ base_dir = os.path.dirname(current_dir)
 
 # Load the data with pre-calculated VAT liability
 print("Loading data...")
-synthetic_firms = pd.read_csv(os.path.join(current_dir, 'synthetic_firms_turnover.csv'))
+synthetic_firms = pd.read_csv(
+    os.path.join(current_dir, 'synthetic_firms_turnover.csv'),
+    engine='pyarrow',
+    usecols=['sic_code', 'annual_turnover_k', 'annual_input_k', 'vat_liability_k', 'weight'],
+    dtype_backend='pyarrow',
+    dtype={
+        'sic_code': 'int32[pyarrow]',
+        'annual_turnover_k': 'float32[pyarrow]',
+        'annual_input_k': 'float32[pyarrow]',
+        'vat_liability_k': 'float32[pyarrow]',
+        'weight': 'float32[pyarrow]',
+    }
+)
 
 weighted_total_firms = synthetic_firms['weight'].sum()
 print(f"Loaded {weighted_total_firms:,.0f} firms with pre-calculated VAT liability")
@@ -26,11 +38,23 @@ if 'vat_liability_k' not in synthetic_firms.columns:
 # Convert VAT liability from thousands to pounds for analysis
 synthetic_firms['vat_liability'] = synthetic_firms['vat_liability_k'] * 1000
 
+# Weighted VAT per firm, computed once and reused by every aggregate below.
+# Inputs are read as float32; £ totals are accumulated in float64.
+synthetic_firms['weighted_vat'] = synthetic_firms['vat_liability'].astype('float64[pyarrow]') * synthetic_firms['weight']
+total_weighted_vat = synthetic_firms['weighted_vat'].sum()
+
+# Weighted firm counts by VAT sign in a single pass: [negative, zero, positive]
+negative_vat_firms, zero_vat_firms, positive_vat_firms = np.bincount(
+    np.sign(synthetic_firms['vat_liability'].to_numpy()).astype(int) + 1,
+    weights=synthetic_firms['weight'].to_numpy(),
+    minlength=3
+)
+
 print(f"\nVAT Liability Statistics:")
-print(f"  Total VAT liability: £{(synthetic_firms['vat_liability'] * synthetic_firms['weight']).sum() / 1_000_000:,.2f} million")
-print(f"  Firms with positive VAT: {synthetic_firms[synthetic_firms['vat_liability'] > 0]['weight'].sum():,.0f}")
-print(f"  Firms with negative VAT: {synthetic_firms[synthetic_firms['vat_liability'] < 0]['weight'].sum():,.0f}")
-print(f"  Firms with zero VAT: {synthetic_firms[synthetic_firms['vat_liability'] == 0]['weight'].sum():,.0f}")
+print(f"  Total VAT liability: £{total_weighted_vat / 1_000_000:,.2f} million")
+print(f"  Firms with positive VAT: {positive_vat_firms:,.0f}")
+print(f"  Firms with negative VAT: {negative_vat_firms:,.0f}")
+print(f"  Firms with zero VAT: {zero_vat_firms:,.0f}")
 
 # Static revenue impact analysis
 # Convert turnover from thousands to pounds for threshold comparison
@@ -43,7 +67,7 @@ affected = synthetic_firms[
 ]
 
 # Calculate total revenue loss (weighted VAT liability)
-total_revenue_loss = (affected['vat_liability'] * affected['weight']).sum()
+total_revenue_loss = affected['weighted_vat'].sum()
 total_revenue_loss_millions = total_revenue_loss / 1_000_000
 
 # Summary statistics (applying weights)
@@ -64,38 +88,41 @@ print("\n" + "="*60)
 print("TOP 5 SECTORS BY VAT LIABILITY IN BUNCHING REGION")
 print("="*60)
 if len(affected) > 0:
-    # Calculate weighted VAT liability by sector
-    sector_impact = affected.groupby('sic_code').apply(
-        lambda x: pd.Series({
-            'weighted_vat_liability': (x['vat_liability'] * x['weight']).sum(),
-            'weighted_firm_count': x['weight'].sum()
-        })
+    # Calculate weighted VAT liability by sector (native groupby sums, no per-group callback)
+    sector_impact = affected.groupby('sic_code')[['weighted_vat', 'weight']].sum().rename(
+        columns={'weighted_vat': 'weighted_vat_liability', 'weight': 'weighted_firm_count'}
     )
     sector_impact = sector_impact.sort_values('weighted_vat_liability', ascending=False).head(5)
     
-    for idx, (sector, row) in enumerate(sector_impact.iterrows(), 1):
-        vat_millions = row['weighted_vat_liability'] / 1_000_000
+    for idx, (sector, weighted_vat_liability, weighted_firm_count) in enumerate(
+        sector_impact[['weighted_vat_liability', 'weighted_firm_count']].itertuples(name=None), 1
+    ):
+        vat_millions = weighted_vat_liability / 1_000_000
         print(f"{idx}. Sector {sector}")
-        print(f"   Firms: {row['weighted_firm_count']:,.0f}, VAT: £{vat_millions:.2f} million")
+        print(f"   Firms: {weighted_firm_count:,.0f}, VAT: £{vat_millions:.2f} million")
 
 # Check data quality
 print("\n" + "="*60)
 print("DATA QUALITY CHECKS")
 print("="*60)
-print(f"Firms with missing SIC codes: {synthetic_firms[synthetic_firms['sic_code'].isna()]['weight'].sum():,.0f}")
-print(f"Firms with zero/negative turnover: {synthetic_firms[synthetic_firms['annual_turnover_k'] <= 0]['weight'].sum():,.0f}")
-print(f"Raw records with zero/negative weights: {(synthetic_firms['weight'] <= 0).sum()}")
-print(f"Firms with non-zero VAT liability: {synthetic_firms[synthetic_firms['vat_liability'] != 0]['weight'].sum():,.0f}")
+# Columns used by the checks, extracted once as arrays
+weights = synthetic_firms['weight'].to_numpy()
+turnover_k = synthetic_firms['annual_turnover_k'].to_numpy()
+input_k = synthetic_firms['annual_input_k'].to_numpy()
+
+print(f"Firms with missing SIC codes: {weights[synthetic_firms['sic_code'].isna().to_numpy()].sum():,.0f}")
+print(f"Firms with zero/negative turnover: {weights[turnover_k <= 0].sum():,.0f}")
+print(f"Raw records with zero/negative weights: {np.count_nonzero(weights <= 0)}")
+print(f"Firms with non-zero VAT liability: {positive_vat_firms + negative_vat_firms:,.0f}")
 
-# Calculate total weighted VAT liability
-total_weighted_vat = (synthetic_firms['vat_liability'] * synthetic_firms['weight']).sum()
+# Total weighted VAT liability
 total_vat_billions = total_weighted_vat / 1_000_000_000
 print(f"Total weighted VAT liability across all firms: £{total_vat_billions:,.2f} billion")
 
 # Show input/output statistics
 print(f"\nInput/Output Statistics:")
 print(f"Average input/output ratio: {(synthetic_firms['annual_input_k'] / synthetic_firms['annual_turnover_k']).mean():.2%}")
-print(f"Firms with input > output (negative VAT): {synthetic_firms[synthetic_firms['annual_input_k'] > synthetic_firms['annual_turnover_k']]['weight'].sum():,.0f}")
+print(f"Firms with input > output (negative VAT): {weights[input_k > turnover_k].sum():,.0f}")
 
 # Generate multi-year revenue impact table
 print("\n" + "="*100)
@@ -113,56 +140,61 @@ fiscal_years = [
 ]
 
 # Calculate PolicyEngine estimates for each year
+# Sort firms by turnover once: every [lower, upper) window is then a pair of binary
+# searches and a difference of prefix sums of weighted VAT
+turnover_order = np.argsort(synthetic_firms['annual_turnover'].to_numpy(), kind='stable')
+sorted_turnover = synthetic_firms['annual_turnover'].to_numpy()[turnover_order]
+cumulative_vat = np.concatenate(([0.0], np.cumsum(synthetic_firms['weighted_vat'].to_numpy()[turnover_order])))
+
+def weighted_vat_in_window(adjusted_turnover, lower, upper):
+    """Sum of weighted VAT for firms with lower <= adjusted turnover < upper."""
+    lo, hi = np.searchsorted(adjusted_turnover, [lower, upper], side='left')
+    return cumulative_vat[hi] - cumulative_vat[lo]
+
+# Fixed schema for the comparison table: one tuple per fiscal year
+RESULT_COLUMNS = [
+    "Fiscal Year", "Lagged RPI used", "Baseline", "Policy",
+    "HMRC Revenue Impact (£m)", "PolicyEngine Impact (£m)", "Difference"
+]
+
 results = []
 for fy in fiscal_years:
-    # Apply growth factor to firm data for this year
-    # Create a copy with adjusted turnover and VAT liability
-    adjusted_firms = synthetic_firms.copy()
-    adjusted_firms['annual_turnover'] = adjusted_firms['annual_turnover_k'] * 1000 * fy['firm_growth']
-    adjusted_firms['vat_liability'] = adjusted_firms['vat_liability_k'] * 1000 * fy['firm_growth']
+    # Apply growth factor to firm turnover (scaling keeps the sort order)
+    adjusted_turnover = sorted_turnover * fy['firm_growth']
     
     # Determine the affected range based on baseline vs policy
     if fy['baseline'] > fy['policy']:
         # When baseline > policy (2028-29), firms between policy and baseline
         # are now required to register (they're above £90k policy but would have been below baseline)
-        baseline_affected = adjusted_firms[
-            (adjusted_firms['annual_turnover'] >= fy['policy']) & 
-            (adjusted_firms['annual_turnover'] < fy['baseline'])
-        ]
         # This is a revenue gain - these firms now must pay VAT
-        pe_impact = (baseline_affected['vat_liability'] * baseline_affected['weight']).sum() / 1_000_000
+        pe_impact = weighted_vat_in_window(adjusted_turnover, fy['policy'], fy['baseline']) * fy['firm_growth'] / 1_000_000
     else:
         # When baseline < policy, firms between baseline and policy can avoid VAT
-        baseline_affected = adjusted_firms[
-            (adjusted_firms['annual_turnover'] >= fy['baseline']) & 
-            (adjusted_firms['annual_turnover'] < fy['policy'])
-        ]
         # This is a revenue loss - these firms avoid VAT
-        pe_impact = -(baseline_affected['vat_liability'] * baseline_affected['weight']).sum() / 1_000_000
+        pe_impact = -weighted_vat_in_window(adjusted_turnover, fy['baseline'], fy['policy']) * fy['firm_growth'] / 1_000_000
     
-    results.append({
-        "Fiscal Year": fy['year'],
-        "Lagged RPI used": fy['rpi'],
-        "Baseline": f"£{fy['baseline']:,}",
-        "Policy": f"£{fy['policy']:,}",
-        "HMRC Revenue Impact (£m)": fy['hmrc_impact'],
-        "PolicyEngine Impact (£m)": round(pe_impact, 0),
-        "Difference": round(pe_impact - fy['hmrc_impact'], 0)
-    })
+    results.append((
+        fy['year'],
+        fy['rpi'],
+        f"£{fy['baseline']:,}",
+        f"£{fy['policy']:,}",
+        fy['hmrc_impact'],
+        round(pe_impact, 0),
+        round(pe_impact - fy['hmrc_impact'], 0)
+    ))
 
 # Create DataFrame for nice display
-import pandas as pd
-results_df = pd.DataFrame(results)
+results_df = pd.DataFrame.from_records(results, columns=RESULT_COLUMNS)
 
 # Display the table
 print("\n" + "-"*100)
 print(f"{'Fiscal Year':<12} {'Lagged RPI':<20} {'Baseline':<12} {'Policy':<12} {'HMRC (£m)':<12} {'PE (£m)':<12} {'Diff (£m)':<10}")
 print("-"*100)
 
-for _, row in results_df.iterrows():
-    print(f"{row['Fiscal Year']:<12} {row['Lagged RPI used']:<20} {row['Baseline']:<12} {row['Policy']:<12} "
-          f"{row['HMRC Revenue Impact (£m)']:>10} {row['PolicyEngine Impact (£m)']:>10} "
-          f"{row['Difference']:>10}")
+for year, rpi, baseline, policy, hmrc_impact, pe_impact, difference in results_df.itertuples(index=False, name=None):
+    print(f"{year:<12} {rpi:<20} {baseline:<12} {policy:<12} "
+          f"{hmrc_impact:>10} {pe_impact:>10} "
+          f"{difference:>10}")
 
 print("-"*100)
 print(f"\nNote: Negative values indicate revenue loss, positive values indicate revenue gain")
@@ -176,7 +208,7 @@ fig, ax = plt.subplots(figsize=(12, 6))
 # Extract data for plotting
 years = [fy['year'] for fy in fiscal_years]
 hmrc_impacts = [fy['hmrc_impact'] for fy in fiscal_years]
-pe_impacts = [row['PolicyEngine Impact (£m)'] for row in results]
+pe_impacts = results_df['PolicyEngine Impact (£m)'].tolist()
 
 # Plot the data
 x = range(len(years))
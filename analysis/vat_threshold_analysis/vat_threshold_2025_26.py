@@ -10,6 +10,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from typing import Dict
 from enum import Enum
+from collections import namedtuple
 from pathlib import Path
 
 
@@ -20,10 +21,50 @@ class TaperType(str, Enum):
     CUSTOM = "custom"
 
 
+# Firm-level arrays for one fiscal year, all in pounds
+AgedArrays = namedtuple('AgedArrays', ['turnover_pounds', 'vat_base', 'weight'])
+
+
 class StandaloneVATCalculator:
-    def __init__(self, data_path: str = "../synthetic_firms.csv"):
-        """Initialize the VAT calculator with synthetic firms data."""
-        self.firms_df = pd.read_csv(data_path)
+    def __init__(self, data_path: str = "../synthetic_firms.csv", cache_parquet: bool = False):
+        """Initialize the VAT calculator with synthetic firms data.
+        
+        With ``cache_parquet`` the parsed columns are cached as Parquet next to the CSV
+        and reused while the cache is at least as new as the CSV.
+        """
+        csv_path = Path(data_path)
+        cache_path = csv_path.with_name(f"{csv_path.stem}_threshold_columns.parquet")
+        self.firms_df = None
+        if cache_parquet and cache_path.exists() and cache_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            try:
+                self.firms_df = pd.read_parquet(cache_path, engine='pyarrow')
+            except (OSError, ValueError):
+                # Truncated or corrupt cache: fall back to the CSV below
+                self.firms_df = None
+        
+        if self.firms_df is None:
+            # Only the columns the calculator uses, parsed by pyarrow straight to float64
+            self.firms_df = pd.read_csv(
+                csv_path,
+                engine='pyarrow',
+                usecols=['annual_turnover_k', 'vat_liability_k', 'weight'],
+                dtype={
+                    'annual_turnover_k': 'float64',
+                    'vat_liability_k': 'float64',
+                    'weight': 'float64',
+                }
+            )
+            if cache_parquet:
+                try:
+                    self.firms_df.to_parquet(cache_path, engine='pyarrow', index=False)
+                except OSError:
+                    # The cache is best-effort, e.g. the data directory may be read-only
+                    pass
+        
+        # Contiguous column arrays, read once and reused by every aging pass
+        self._turnover_k = self.firms_df['annual_turnover_k'].to_numpy()
+        self._vat_liability_k = self.firms_df['vat_liability_k'].to_numpy()
+        self._weight = self.firms_df['weight'].to_numpy()
         
         self.fiscal_years = [
             {"year": "2025-26", "baseline": 90000, "firm_growth": 1.0516},
@@ -35,31 +76,31 @@ class StandaloneVATCalculator:
         ]
         
         self.vat_rate = 0.20
+        # Per year index: turnover-sorted suffix sums answering untapered threshold queries
+        self._threshold_sums = {}
 
-    def age_data(self, year_index: int) -> pd.DataFrame:
+    def age_data(self, year_index: int) -> AgedArrays:
         """Apply growth factors to age the data to a specific year."""
-        df = self.firms_df.copy()
         growth_factor = self.fiscal_years[year_index]["firm_growth"]
         
-        # Apply growth to firm weights (population growth)
-        df['weight'] = df['weight'] * growth_factor
-        
-        # Apply turnover growth (2.5% per year linear)
-        df['annual_turnover_k'] = df['annual_turnover_k'] * (1 + (year_index * 0.025))
-        
-        return df
+        # Derived from the cached column arrays, no frame copy: growth applies to firm
+        # weights (population growth) and turnover (2.5% per year linear)
+        return AgedArrays(
+            turnover_pounds=self._turnover_k * (1 + (year_index * 0.025)) * 1000,
+            vat_base=self._vat_liability_k * 1000,
+            weight=self._weight * growth_factor,
+        )
 
-    def calculate_vat_liability(self, df: pd.DataFrame, threshold: int, 
+    def calculate_vat_liability(self, aged: AgedArrays, threshold: int, 
                                taper_type: TaperType = TaperType.NONE,
                                taper_start: int = None, 
-                               taper_end: int = None) -> pd.DataFrame:
-        """Calculate VAT liability based on threshold and taper settings."""
-        df = df.copy()
+                               taper_end: int = None) -> np.ndarray:
+        """Calculate VAT liability based on threshold and taper settings.
         
-        # Convert turnover to pounds for threshold comparison
-        df['turnover_pounds'] = df['annual_turnover_k'] * 1000
-        # Convert existing VAT liability from thousands to pounds
-        df['vat_liability_base'] = df['vat_liability_k'] * 1000
+        Returns each firm's VAT liability (£), aligned with the ``aged`` arrays.
+        """
+        turnover_pounds = aged.turnover_pounds
+        vat_liability_base = aged.vat_base
         
         if taper_type != TaperType.NONE:
             # Calculate taper parameters
@@ -73,54 +114,84 @@ class StandaloneVATCalculator:
                 taper_start = taper_start or threshold * 0.75
                 taper_end = taper_end or threshold
             
-            # Calculate taper multiplier
-            df['taper_multiplier'] = 0.0
-            
-            # Firms in taper range get proportional multiplier
-            in_taper = (df['turnover_pounds'] >= taper_start) & (df['turnover_pounds'] < taper_end)
-            progress = (df.loc[in_taper, 'turnover_pounds'] - taper_start) / (taper_end - taper_start)
-            df.loc[in_taper, 'taper_multiplier'] = progress
-            
-            # Firms above taper end get full multiplier
-            above_taper = df['turnover_pounds'] >= taper_end
-            df.loc[above_taper, 'taper_multiplier'] = 1.0
+            # Calculate taper multiplier: 0 below the taper, proportional inside it and
+            # 1 from the taper end, i.e. the clipped linear ramp between the two
+            if taper_end > taper_start:
+                taper_multiplier = np.clip((turnover_pounds - taper_start) / (taper_end - taper_start), 0.0, 1.0)
+            else:
+                # Degenerate taper: a plain step at the taper end
+                taper_multiplier = np.where(turnover_pounds >= taper_end, 1.0, 0.0)
             
             # Apply taper to existing VAT liability
-            df['vat_liability'] = df['vat_liability_base'] * df['taper_multiplier']
-        else:
-            # Simple threshold: firms below threshold pay no VAT
-            df['is_registered'] = df['turnover_pounds'] >= threshold
-            df['vat_liability'] = np.where(
-                df['is_registered'],
-                df['vat_liability_base'],
-                0
-            )
+            return vat_liability_base * taper_multiplier
         
-        return df
+        # Simple threshold: firms below threshold pay no VAT
+        return np.where(turnover_pounds >= threshold, vat_liability_base, 0)
 
     def calculate_revenue_for_threshold(self, threshold: int, year_index: int = 0,
                                        taper_type: TaperType = TaperType.NONE) -> Dict:
         """Calculate VAT revenue for a specific threshold and year."""
-        year_info = self.fiscal_years[year_index]
+        baseline_revenue, baseline_registered = self._calculate_baseline_totals(year_index)
+        
+        if taper_type == TaperType.NONE:
+            reform_revenue, reform_registered = self._untapered_totals(year_index, threshold)
+            return self._summarise_impact(threshold, year_index, baseline_revenue, baseline_registered,
+                                          reform_revenue, reform_registered)
         
         # Age data to the specified year
-        df = self.age_data(year_index)
+        aged = self.age_data(year_index)
+        return self._calculate_reform_impact(aged, year_index, baseline_revenue, baseline_registered,
+                                             threshold, taper_type)
+
+    def _calculate_baseline_totals(self, year_index: int) -> tuple:
+        """Baseline VAT revenue and registered firms (current threshold) for a year."""
+        return self._untapered_totals(year_index, self.fiscal_years[year_index]["baseline"])
+
+    def _untapered_totals(self, year_index: int, threshold):
+        """VAT revenue and VAT-paying firms under a plain threshold (scalar or array).
         
-        # Calculate baseline VAT (current threshold)
-        baseline_df = self.calculate_vat_liability(df.copy(), year_info["baseline"])
-        baseline_revenue = (baseline_df['vat_liability'] * baseline_df['weight']).sum()
+        Firms are sorted by aged turnover once per year; a threshold's totals are then the
+        suffix sums from its ``searchsorted`` position, i.e. over firms at or above it.
+        """
+        if year_index not in self._threshold_sums:
+            aged = self.age_data(year_index)
+            order = np.argsort(aged.turnover_pounds, kind='stable')
+            weighted_vat = (aged.vat_base * aged.weight)[order]
+            paying_weight = np.where(aged.vat_base > 0, aged.weight, 0)[order]
+            # Trailing zero so a threshold above every firm maps to empty totals
+            self._threshold_sums[year_index] = (
+                aged.turnover_pounds[order],
+                np.append(np.cumsum(weighted_vat[::-1])[::-1], 0.0),
+                np.append(np.cumsum(paying_weight[::-1])[::-1], 0.0),
+            )
+        sorted_turnover, revenue_suffix, paying_suffix = self._threshold_sums[year_index]
         
+        idx = np.searchsorted(sorted_turnover, threshold, side='left')
+        return revenue_suffix[idx], paying_suffix[idx]
+
+    def _calculate_reform_impact(self, aged: AgedArrays, year_index: int, baseline_revenue: float,
+                                 baseline_registered: float, threshold: int,
+                                 taper_type: TaperType = TaperType.NONE) -> Dict:
+        """Revenue and firm impacts of one threshold against precomputed baseline totals."""
         # Calculate reform VAT (new threshold)
-        reform_df = self.calculate_vat_liability(df.copy(), threshold, taper_type)
-        reform_revenue = (reform_df['vat_liability'] * reform_df['weight']).sum()
+        reform_vat = self.calculate_vat_liability(aged, threshold, taper_type)
+        reform_revenue = (reform_vat * aged.weight).sum()
+        
+        # Count firms affected
+        reform_registered = aged.weight[reform_vat > 0].sum()
+        
+        return self._summarise_impact(threshold, year_index, baseline_revenue, baseline_registered,
+                                      reform_revenue, reform_registered)
+
+    def _summarise_impact(self, threshold: int, year_index: int, baseline_revenue: float,
+                          baseline_registered: float, reform_revenue: float,
+                          reform_registered: float) -> Dict:
+        """Result record for one threshold from baseline and reform totals."""
+        year_info = self.fiscal_years[year_index]
         
         # Calculate impacts
         revenue_change = reform_revenue - baseline_revenue
         
-        # Count firms affected
-        baseline_registered = baseline_df[baseline_df['vat_liability'] > 0]['weight'].sum()
-        reform_registered = reform_df[reform_df['vat_liability'] > 0]['weight'].sum()
-        
         return {
             "threshold": threshold,
             "year": year_info["year"],
@@ -136,12 +207,70 @@ class StandaloneVATCalculator:
     def calculate_revenue_curve(self, thresholds: list, year_index: int = 0,
                               taper_type: TaperType = TaperType.NONE) -> pd.DataFrame:
         """Calculate revenue changes for multiple thresholds."""
-        results = []
-        for threshold in thresholds:
-            result = self.calculate_revenue_for_threshold(threshold, year_index, taper_type)
-            results.append(result)
+        baseline_revenue, baseline_registered = self._calculate_baseline_totals(year_index)
+        
+        if taper_type != TaperType.NONE:
+            # Aged data is the same for every threshold, so age it once
+            aged = self.age_data(year_index)
+            results = []
+            for threshold in thresholds:
+                result = self._calculate_reform_impact(aged, year_index, baseline_revenue, baseline_registered,
+                                                       threshold, taper_type)
+                results.append(result)
+            
+            return pd.DataFrame(results)
+        
+        # Without a taper every threshold is a lookup into the sorted suffix sums
+        reform_revenue, reform_registered = self._untapered_totals(year_index, np.asarray(thresholds))
         
-        return pd.DataFrame(results)
+        return pd.DataFrame([
+            self._summarise_impact(threshold, year_index, baseline_revenue, baseline_registered,
+                                   reform_revenue[i], reform_registered[i])
+            for i, threshold in enumerate(thresholds)
+        ])
+
+
+# Axis styling shared by both threshold charts
+_AXIS_STYLE = dict(
+    showgrid=True,
+    gridcolor='rgba(0,0,0,0.15)',
+    griddash='solid',
+    zeroline=False,
+    showline=True,
+    linewidth=2,
+    linecolor='black',
+    mirror=True,
+    tickfont=dict(size=16)
+)
+
+
+def _chart_layout(title: str, yaxis_title: str, tickvals, **yaxis) -> Dict:
+    """Layout for a threshold chart; extra keyword arguments are added to the y-axis."""
+    return dict(
+        title=dict(
+            text=title,
+            x=0.5,
+            xanchor='center',
+            font=dict(size=24)
+        ),
+        xaxis_title=dict(text="Registration threshold (£k)", font=dict(size=18)),
+        yaxis_title=dict(text=yaxis_title, font=dict(size=18)),
+        font=dict(family="Arial, sans-serif", size=16),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(
+            tickmode='array',
+            tickvals=tickvals,
+            ticktext=[f'{int(x)}' for x in tickvals],
+            **_AXIS_STYLE
+        ),
+        yaxis=dict(**_AXIS_STYLE, **yaxis),
+        showlegend=False,
+        hovermode='closest',
+        height=600,
+        width=1000,
+        margin=dict(l=100, r=50, t=80, b=80)
+    )
 
 
 def generate_threshold_chart():
@@ -151,7 +280,7 @@ def generate_threshold_chart():
     
     # Initialize calculator
     print("Loading data and calculating revenue impacts for 2025-26...")
-    calculator = StandaloneVATCalculator(data_path="../synthetic_firms.csv")
+    calculator = StandaloneVATCalculator(data_path="../synthetic_firms.csv", cache_parquet=True)
     
     # Define 11 example thresholds: from 70k to 120k including 90k
     thresholds = [70000, 75000, 80000, 85000, 90000, 95000, 100000, 105000, 110000, 115000, 120000]
@@ -168,17 +297,16 @@ def generate_threshold_chart():
     # Prepare data for Plotly Express
     results['threshold_k'] = results['threshold'] / 1000
     results['firms_k'] = results['firms_affected'] / 1000
-    results['hover_text'] = results.apply(
-        lambda row: f"<b>Threshold: £{int(row['threshold']/1000)}k</b><br>" + 
-                   f"Revenue change: {'+'if row['revenue_change_millions'] >= 0 else ''}{row['revenue_change_millions']:.1f}m<br>" +
-                   f"Firms affected: {row['firms_affected']/1000:.1f}k",
-        axis=1
+    revenue_sign = pd.Series(np.where(results['revenue_change_millions'] >= 0, '+', ''), index=results.index)
+    results['hover_text'] = (
+        "<b>Threshold: £" + (results['threshold'] // 1000).astype(str) + "k</b><br>" +
+        "Revenue change: " + revenue_sign + results['revenue_change_millions'].map('{:.1f}'.format) + "m<br>" +
+        "Firms affected: " + (results['firms_affected'] / 1000).map('{:.1f}'.format) + "k"
     )
     
     # Calculate signed change in firms
-    results['firms_change'] = results.apply(
-        lambda row: row['firms_affected'] if row['threshold'] < 90000 else -row['firms_affected'],
-        axis=1
+    results['firms_change'] = np.where(
+        results['threshold'] < 90000, results['firms_affected'], -results['firms_affected']
     )
     results['firms_change_k'] = results['firms_change'] / 1000
     
@@ -229,49 +357,11 @@ def generate_threshold_chart():
     )
     
     # Update layout
-    fig.update_layout(
-        title=dict(
-            text=f"Impact of VAT threshold changes on tax revenue ({fiscal_year})",
-            x=0.5,
-            xanchor='center',
-            font=dict(size=24)
-        ),
-        xaxis_title=dict(text="Registration threshold (£k)", font=dict(size=18)),
-        yaxis_title=dict(text="Revenue (£m)", font=dict(size=18)),
-        font=dict(family="Arial, sans-serif", size=16),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        xaxis=dict(
-            tickmode='array',
-            tickvals=results['threshold'] / 1000,
-            ticktext=[f'{int(x)}' for x in results['threshold'] / 1000],
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.15)',
-            griddash='solid',
-            zeroline=False,
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            mirror=True,
-            tickfont=dict(size=16)
-        ),
-        yaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.15)',
-            griddash='solid',
-            zeroline=False,
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            mirror=True,
-            tickfont=dict(size=16)
-        ),
-        showlegend=False,
-        hovermode='closest',
-        height=600,
-        width=1000,
-        margin=dict(l=100, r=50, t=80, b=80)
-    )
+    fig.update_layout(**_chart_layout(
+        f"Impact of VAT threshold changes on tax revenue ({fiscal_year})",
+        "Revenue (£m)",
+        results['threshold'] / 1000
+    ))
     
     # Save revenue chart
     output_html = f'results/revenue_impact_{fiscal_year.replace("-", "_")}.html'
@@ -320,50 +410,12 @@ def generate_threshold_chart():
     )
     
     # Update layout for firms chart
-    fig2.update_layout(
-        title=dict(
-            text=f"Change in VAT-paying firms by threshold ({fiscal_year})",
-            x=0.5,
-            xanchor='center',
-            font=dict(size=24)
-        ),
-        xaxis_title=dict(text="Registration threshold (£k)", font=dict(size=18)),
-        yaxis_title=dict(text="Change in number of firms (thousands)", font=dict(size=18)),
-        font=dict(family="Arial, sans-serif", size=16),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        xaxis=dict(
-            tickmode='array',
-            tickvals=results['threshold'] / 1000,
-            ticktext=[f'{int(x)}' for x in results['threshold'] / 1000],
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.15)',
-            griddash='solid',
-            zeroline=False,
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            mirror=True,
-            tickfont=dict(size=16)
-        ),
-        yaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(0,0,0,0.15)',
-            griddash='solid',
-            zeroline=False,
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            mirror=True,
-            tickfont=dict(size=16),
-            tickformat='.0f'
-        ),
-        showlegend=False,
-        hovermode='closest',
-        height=600,
-        width=1000,
-        margin=dict(l=100, r=50, t=80, b=80)
-    )
+    fig2.update_layout(**_chart_layout(
+        f"Change in VAT-paying firms by threshold ({fiscal_year})",
+        "Change in number of firms (thousands)",
+        results['threshold'] / 1000,
+        tickformat='.0f'
+    ))
     
     # Save firms chart
     output_firms_html = f'results/firms_impact_{fiscal_year.replace("-", "_")}.html'
@@ -385,10 +437,12 @@ def generate_threshold_chart():
     print(f"{'Threshold':>12} | {'Revenue Change':>15} | {'Firms Affected (in 1,000)':>25}")
     print("-"*70)
     
-    for _, row in results.iterrows():
-        threshold_str = f"£{int(row['threshold']/1000)}k"
-        revenue_str = f"{'+'if row['revenue_change_millions'] >= 0 else ''}{row['revenue_change_millions']:.1f}m"
-        firms_str = f"{row['firms_affected']/1000:.1f}"
+    for threshold, revenue_change, firms_affected in results[
+        ['threshold', 'revenue_change_millions', 'firms_affected']
+    ].itertuples(index=False, name=None):
+        threshold_str = f"£{int(threshold/1000)}k"
+        revenue_str = f"{'+'if revenue_change >= 0 else ''}{revenue_change:.1f}m"
+        firms_str = f"{firms_affected/1000:.1f}"
         
         print(f"{threshold_str:>12} | {revenue_str:>15} | {firms_str:>25}")
     
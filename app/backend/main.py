@@ -52,21 +52,7 @@ async def get_baseline():
     """Get baseline VAT statistics across all years."""
     try:
         calculator = get_calculator()
-        baseline_stats = []
-        for i, year_info in enumerate(calculator.fiscal_years):
-            df = calculator.age_data(i)
-            baseline_df = calculator.calculate_vat_liability(df, year_info["baseline"])
-            
-            total_revenue = (baseline_df['vat_liability'] * baseline_df['weight']).sum()
-            registered_firms = baseline_df[baseline_df['vat_liability'] > 0]['weight'].sum()
-            
-            baseline_stats.append({
-                "year": year_info["year"],
-                "threshold": year_info["baseline"],
-                "total_revenue_billions": total_revenue / 1e9,
-                "registered_firms": int(registered_firms),
-                "growth_factor": year_info["firm_growth"]
-            })
+        baseline_stats = calculator.calculate_baseline_statistics()
         
         return {"baseline_statistics": baseline_stats}
     except KeyError as ke: